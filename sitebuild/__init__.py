@@ -0,0 +1,17 @@
+"""Local, incremental builder for this GitHub Pages site.
+
+GitHub Pages builds the site remotely with Jekyll; this package renders the
+same sources locally so that edits can be previewed without a push.  Run it
+with ``python -m sitebuild build`` from the repository root.
+
+Only the standard library is required.  Optional packages, listed in
+``requirements.txt``, enable more: PyYAML full YAML in ``_config.yml`` and
+front matter, brotli ``.br`` siblings, and Pillow responsive image variants.
+"""
+
+__version__ = "0.1.0"
+
+from .builder import BuildResult, build  # noqa: E402
+from .config import load_config  # noqa: E402
+
+__all__ = ["BuildResult", "build", "load_config", "__version__"]
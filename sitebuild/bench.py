@@ -0,0 +1,196 @@
+"""Build benchmarks over synthetic sites.
+
+Generates sites of a given number of pages next to a copy of the real
+``_config.yml`` (and ``_layouts``, if the site has any), then times three
+scenarios per size:
+
+``cold``
+    a build into an empty destination;
+``warm``
+    a rebuild with nothing changed;
+``edit``
+    a rebuild after changing the body of a single page.
+
+Results, including the per-stage timings from :class:`BuildResult`, are
+written as JSON.  ``--profile`` additionally dumps :mod:`cProfile` stats
+per run for ``python -m pstats`` or snakeviz.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Any
+
+from . import __version__
+from .builder import BuildResult, build
+from .config import CONFIG_NAME, load_config
+
+DEFAULT_SIZES = (10, 1_000, 100_000)
+SCENARIOS = ("cold", "warm", "edit")
+PAGES_PER_DIR = 1_000
+
+_STYLESHEET = """\
+.post { max-width: 40em; margin: 0 auto; }
+.post nav a { margin-right: 1em; }
+"""
+
+
+def _page_rel(index: int) -> str:
+    return f"posts/{index // PAGES_PER_DIR:03d}/page-{index}.html"
+
+
+def _page(index: int, count: int, revision: int = 0) -> str:
+    prev_link = f'<a href="/{_page_rel(index - 1)}">previous</a>' if index else ""
+    next_link = f'<a href="/{_page_rel(index + 1)}">next</a>' if index + 1 < count else ""
+    paragraphs = "\n".join(
+        f"<p>Paragraph {n} of page {index}, revision {revision}. "
+        "Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>"
+        for n in range(5)
+    )
+    return (
+        f"---\ntitle: Page {index}\n---\n"
+        '<link rel="stylesheet" href="/assets/css/site.css">\n'
+        f'<article class="post">\n<h1>Page {index}</h1>\n{paragraphs}\n'
+        f'<nav><a href="/">home</a>{prev_link}{next_link}</nav>\n</article>\n'
+    )
+
+
+def generate_site(root: str, pages: int, source: str = ".") -> None:
+    """Write a synthetic site of *pages* pages under *root*.
+
+    The configuration and layouts are copied from the site at *source*, so
+    the benchmark renders through the same theme as the real site.
+    """
+    os.makedirs(os.path.join(root, "assets", "css"), exist_ok=True)
+    config = os.path.join(source, CONFIG_NAME)
+    if os.path.isfile(config):
+        shutil.copyfile(config, os.path.join(root, CONFIG_NAME))
+    layouts = os.path.join(source, "_layouts")
+    if os.path.isdir(layouts):
+        shutil.copytree(layouts, os.path.join(root, "_layouts"))
+    with open(os.path.join(root, "assets", "css", "site.css"), "w", encoding="utf-8") as fh:
+        fh.write(_STYLESHEET)
+    with open(os.path.join(root, "index.html"), "w", encoding="utf-8") as fh:
+        fh.write(f'---\ntitle: Home\n---\n<a href="/{_page_rel(0)}">first page</a>\n')
+    for index in range(pages):
+        path = os.path.join(root, *_page_rel(index).split("/"))
+        if index % PAGES_PER_DIR == 0:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(_page(index, pages))
+
+
+def _timed_build(root: str, profile_path: str | None, workers: int | None) -> BuildResult:
+    if profile_path is None:
+        return build(root, workers=workers)
+    profiler = cProfile.Profile()
+    result = profiler.runcall(build, root, workers=workers)
+    profiler.dump_stats(profile_path)
+    return result
+
+
+def _record(pages: int, scenario: str, result: BuildResult) -> dict[str, Any]:
+    return {
+        "pages": pages,
+        "scenario": scenario,
+        "seconds": result.elapsed,
+        "stages": dict(sorted(result.stages.items())),
+        "rendered": len(result.rendered),
+        "copied": len(result.copied),
+        "skipped": len(result.skipped),
+        "removed": len(result.removed),
+    }
+
+
+def run(
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    *,
+    source: str = ".",
+    scenarios: tuple[str, ...] = SCENARIOS,
+    repeat: int = 1,
+    workdir: str | None = None,
+    profile_dir: str | None = None,
+    workers: int | None = None,
+    log: Any = None,
+) -> dict[str, Any]:
+    """Run every scenario for every size and return the JSON-ready report.
+
+    Each scenario runs *repeat* times and the fastest run is kept; ``warm``
+    and ``edit`` are preceded by an untimed build when they do not follow
+    ``cold``.  Sites are
+    generated in a temporary directory unless *workdir* is given, in which
+    case they are left behind for inspection.  *workers* is passed on to
+    :func:`build`; profiles only cover the parent process.
+    """
+    if repeat < 1:
+        raise ValueError(f"repeat must be at least 1, not {repeat}")
+    report: dict[str, Any] = {
+        "sitebuild": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "workers": workers,
+        "runs": [],
+    }
+    tmp = None
+    if workdir is None:
+        tmp = workdir = tempfile.mkdtemp(prefix="sitebuild-bench-")
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+    try:
+        for pages in sizes:
+            root = os.path.join(workdir, f"site-{pages}")
+            shutil.rmtree(root, ignore_errors=True)
+            started = time.perf_counter()
+            generate_site(root, pages, source)
+            if log:
+                log(f"{pages} pages: generated in {time.perf_counter() - started:.2f} s")
+            destination = load_config(root).destination
+            revision = 0
+            built = False
+            for scenario in scenarios:
+                if scenario != "cold" and not built:
+                    # warm and edit time rebuilds; the first build is not theirs.
+                    build(root, workers=workers)
+                    built = True
+                best = None
+                for attempt in range(repeat):
+                    if scenario == "cold":
+                        shutil.rmtree(destination, ignore_errors=True)
+                    elif scenario == "edit" and pages:
+                        revision += 1
+                        path = os.path.join(root, *_page_rel(pages // 2).split("/"))
+                        with open(path, "w", encoding="utf-8") as fh:
+                            fh.write(_page(pages // 2, pages, revision))
+                    profile_path = None
+                    if profile_dir is not None:
+                        profile_path = os.path.join(
+                            profile_dir, f"{pages}-{scenario}-{attempt}.prof"
+                        )
+                    result = _timed_build(root, profile_path, workers)
+                    built = True
+                    if best is None or result.elapsed < best.elapsed:
+                        best = result
+                record = _record(pages, scenario, best)
+                report["runs"].append(record)
+                if log:
+                    log(f"{pages} pages: {scenario} {record['seconds'] * 1000:.1f} ms")
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return report
+
+
+def write_report(report: dict[str, Any], path: str | None) -> None:
+    data = json.dumps(report, indent=2) + "\n"
+    if path is None or path == "-":
+        print(data, end="")
+        return
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(data)
@@ -0,0 +1,933 @@
+"""Incremental site build driven by ``_config.yml``.
+
+Every ``.html`` page under the source directory is rendered through its
+layout chain into the destination directory; every other file is copied.
+Unlike stock Jekyll, pages without front matter are rendered through the
+``default`` layout as well, so that a bare ``index.html`` previews under the
+configured theme.  Set ``layout: none`` in front matter to opt out.
+
+A manifest in the destination directory records, for every output, a key
+derived from the content hashes of its inputs (the source file, the layouts
+it renders through and the configuration).  Outputs whose key is unchanged
+are left alone, and source hashes are cached against ``(mtime, size)`` so a
+no-op rebuild does not have to read any source file.
+
+Static assets are emitted under content-hashed names (see
+:mod:`sitebuild.fingerprint`), ``asset-manifest.json`` maps their logical
+paths to those names, and text outputs get precompressed siblings (see
+:mod:`sitebuild.compress`).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from fnmatch import fnmatch
+from typing import Any, Iterator
+
+from . import __version__
+from .compress import ENCODINGS, available_encodings, compress, is_compressible
+from .bundle import BUNDLE_EXTENSIONS, PageOptimizer
+from .config import Config, load_config, split_front_matter
+from .fingerprint import (
+    css_urls,
+    hashed_name,
+    resolve,
+    rewrite_css,
+    rewrite_html,
+    should_fingerprint,
+)
+from .images import Image, ImageCache, ImageInfo, available_formats, is_raster, rewrite_images
+from .indexes import IndexEntry, index_entry, write_indexes
+from .minify import minify_css, minify_js
+from .parallel import cpu_count, map_batches, worker_count
+from .template import NO_LAYOUT, Layouts, Template, TemplateError
+
+THEMES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "themes")
+MANIFEST_NAME = ".sitebuild-manifest.json"
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+#: Index entries of the built pages; see :class:`_EntryFile`.
+ENTRIES_NAME = ".sitebuild-index.jsonl"
+PAGE_EXTENSIONS = (".html", ".htm")
+DEFAULT_LAYOUT = "default"
+
+#: Owner of the sitemap, feed and search index outputs in the manifest.
+_INDEX_OWNER = "\0indexes"
+
+#: Stored in place of a layout name for pages that did not ask for one.
+_IMPLICIT_LAYOUT = "*"
+_MANIFEST_VERSION = 5
+
+
+class BuildError(RuntimeError):
+    """Raised when a page cannot be rendered."""
+
+
+@dataclass(frozen=True)
+class SourceFile:
+    """A file that produces exactly one output at ``rel`` (a POSIX path)."""
+
+    rel: str
+    path: str
+    is_page: bool
+
+
+@dataclass
+class BuildResult:
+    """What a build did, with wall time in seconds per stage.
+
+    Stages are ``config``, ``scan`` (walking and hashing sources), ``plan``
+    (deciding which outputs are out of date), ``images`` (see
+    :mod:`sitebuild.images`), ``render``, ``bundle`` (see
+    :mod:`sitebuild.bundle`), ``index`` (see :mod:`sitebuild.indexes`),
+    ``write``, ``compress`` and ``finalize`` (removing stale outputs and saving
+    manifests); they do not overlap.
+    """
+
+    destination: str
+    rendered: list[str] = field(default_factory=list)
+    copied: list[str] = field(default_factory=list)
+    skipped: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+    stages: dict[str, float] = field(default_factory=dict)
+    notes: list[str] = field(default_factory=list)
+    _running: list[list[Any]] = field(default_factory=list, repr=False, compare=False)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Add the time spent in the ``with`` block to stage *name*.
+
+        A nested stage pauses the one around it, so time is never counted
+        twice.
+        """
+        now = time.perf_counter()
+        if self._running:
+            self._add(now)
+        self._running.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add(now)
+            self._running.pop()
+            if self._running:
+                self._running[-1][1] = now
+
+    def _add(self, now: float) -> None:
+        name, started = self._running[-1]
+        self.stages[name] = self.stages.get(name, 0.0) + now - started
+        self._running[-1][1] = now
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.rendered or self.copied or self.removed)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.rendered)} rendered, {len(self.copied)} copied, "
+            f"{len(self.skipped)} unchanged, {len(self.removed)} removed "
+            f"in {self.elapsed * 1000:.1f} ms"
+        )
+
+
+def theme_dir(config: Config) -> str | None:
+    """Return the bundled directory for the configured theme, if there is one."""
+    theme = config.get("theme")
+    if not theme:
+        return None
+    name = str(theme)
+    if name.startswith("jekyll-theme-"):
+        name = name[len("jekyll-theme-"):]
+    path = os.path.join(THEMES_DIR, name)
+    return path if os.path.isdir(path) else None
+
+
+def _is_excluded(rel: str, name: str, config: Config) -> bool:
+    if any(fnmatch(rel, pattern) or fnmatch(name, pattern) for pattern in config["include"]):
+        return False
+    if name[0] in "._#" or name.endswith("~"):
+        return True
+    return any(
+        rel == pattern.strip("/") or fnmatch(rel, pattern) for pattern in config["exclude"]
+    )
+
+
+def _walk(top: str, config: Config | None, skip: set[str]) -> dict[str, SourceFile]:
+    files: dict[str, SourceFile] = {}
+    stack = [(top, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        for entry in os.scandir(directory):
+            rel = prefix + entry.name
+            if entry.path in skip:
+                continue
+            if config is not None and _is_excluded(rel, entry.name, config):
+                continue
+            if config is None and entry.name[0] in "._":
+                continue
+            if entry.is_dir():
+                stack.append((entry.path, rel + "/"))
+            elif entry.is_file():
+                is_page = os.path.splitext(entry.name)[1].lower() in PAGE_EXTENSIONS
+                files[rel] = SourceFile(rel, entry.path, is_page)
+    return files
+
+
+def scan(config: Config) -> dict[str, SourceFile]:
+    """Map every output path to the source file that produces it.
+
+    Files shipped with the theme (its stylesheets, for instance) are included
+    unless the site provides a file at the same path.
+    """
+    files: dict[str, SourceFile] = {}
+    theme = theme_dir(config)
+    if theme is not None:
+        for rel, source in _walk(theme, None, set()).items():
+            # Theme HTML files are layouts and includes, never pages.
+            files[rel] = SourceFile(rel, source.path, False)
+    files.update(_walk(config.source, config, {config.destination}))
+    return files
+
+
+def layout_dirs(config: Config) -> list[str]:
+    dirs = [os.path.join(config.source, "_layouts")]
+    theme = theme_dir(config)
+    if theme is not None:
+        dirs.append(os.path.join(theme, "_layouts"))
+    return dirs
+
+
+class Manifest:
+    """Build state persisted between runs in the destination directory."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.sources: dict[str, list[Any]] = {}
+        self.outputs: dict[str, str] = {}
+        self.assets: dict[str, str] = {}
+        # Page -> outputs written while rendering it (such as bundles),
+        # which stay in use for as long as the page is unchanged.
+        self.attached: dict[str, list[str]] = {}
+        # Identifies the page keys the index files were last written from.
+        self.index_key = ""
+
+    @classmethod
+    def load(cls, path: str) -> "Manifest":
+        manifest = cls(path)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return manifest
+        if data.get("version") == _MANIFEST_VERSION:
+            manifest.sources = data.get("sources", {})
+            manifest.outputs = data.get("outputs", {})
+            manifest.assets = data.get("assets", {})
+            manifest.attached = data.get("attached", {})
+            manifest.index_key = data.get("index_key", "")
+        return manifest
+
+    def save(self) -> None:
+        data = {
+            "version": _MANIFEST_VERSION,
+            "sources": self.sources,
+            "outputs": self.outputs,
+            "assets": self.assets,
+            "attached": self.attached,
+            "index_key": self.index_key,
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, sort_keys=True, separators=(",", ":"))
+        os.replace(tmp, self.path)
+
+
+def _requested_layout(meta: dict[str, Any] | None) -> str | None:
+    if meta is None or "layout" not in meta:
+        return _IMPLICIT_LAYOUT
+    layout = meta["layout"]
+    return None if layout in NO_LAYOUT else str(layout)
+
+
+def _resolve_layout(requested: str | None, layouts: Layouts) -> str | None:
+    if requested == _IMPLICIT_LAYOUT:
+        return DEFAULT_LAYOUT if DEFAULT_LAYOUT in layouts else None
+    return requested
+
+
+class _SourceCache:
+    """Content hashes of source files, reused while ``(mtime, size)`` hold."""
+
+    def __init__(self, previous: dict[str, list[Any]]):
+        self.previous = previous
+        self.current: dict[str, list[Any]] = {}
+
+    def lookup(self, source: SourceFile) -> tuple[str, str | None]:
+        """Return the digest of *source* and, for pages, the layout it asked for."""
+        st = os.stat(source.path)
+        entry = self.previous.get(source.path)
+        if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+            with open(source.path, "rb") as fh:
+                raw = fh.read()
+            layout = None
+            if source.is_page:
+                meta, _ = split_front_matter(_decode(source, raw), source.path)
+                layout = _requested_layout(meta)
+            entry = [st.st_mtime_ns, st.st_size, hashlib.sha256(raw).hexdigest(), layout]
+        self.current[source.path] = entry
+        return entry[2], entry[3]
+
+
+def _decode(source: SourceFile, raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        raise BuildError(f"{source.rel}: not valid UTF-8 ({exc.reason} at byte {exc.start})") from None
+
+
+def page_url(rel: str) -> str:
+    """The URL Jekyll assigns to the page at *rel*."""
+    url = "/" + rel
+    if posixpath.basename(url) in ("index.html", "index.htm"):
+        url = posixpath.dirname(url).rstrip("/") + "/"
+    return url
+
+
+def render_page(source: SourceFile, config: Config, layouts: Layouts) -> str:
+    """Render the page *source* through its layout chain."""
+    return _render(source, config, layouts)[1]
+
+
+def _render(source: SourceFile, config: Config, layouts: Layouts) -> tuple[dict[str, Any], str]:
+    """Return the front matter of the page *source* and the page rendered."""
+    with open(source.path, "rb") as fh:
+        text = _decode(source, fh.read())
+    meta, body = split_front_matter(text, source.path)
+    page = dict(meta or {})
+    page.setdefault("title", config.get("title") or "")
+    page["url"] = page_url(source.rel)
+    page["path"] = source.rel
+    context = {"site": config.data, "page": page}
+    layout = _resolve_layout(_requested_layout(meta), layouts)
+    try:
+        content = Template.compile(body).render(context)
+        return meta or {}, layouts.render(layout, content, context)
+    except TemplateError as exc:
+        raise BuildError(f"{source.rel}: {exc}") from None
+
+
+class _Writer:
+    """Writes outputs and their compressed siblings, recording their keys."""
+
+    def __init__(
+        self,
+        dest: str,
+        previous: dict[str, str],
+        encodings: list[str],
+        result: BuildResult,
+        previous_attached: dict[str, list[str]] | None = None,
+    ):
+        self.dest = dest
+        self.previous = previous
+        self.previous_attached = previous_attached or {}
+        self.encodings = encodings
+        self.suffixes = [ENCODINGS[name][0] for name in encodings]
+        self.result = result
+        self.outputs: dict[str, str] = {}
+        self.attached: dict[str, list[str]] = {}
+
+    def path(self, rel: str) -> str:
+        return os.path.join(self.dest, *rel.split("/"))
+
+    def fresh(self, rel: str, key: str) -> bool:
+        """Keep *rel* (and its siblings) if it was built from the same inputs."""
+        if self.previous.get(rel) != key or not os.path.exists(self.path(rel)):
+            return False
+        if rel in self.previous_attached and not self.keep_attached(rel):
+            return False
+        self._keep(rel, key)
+        self.result.skipped.append(rel)
+        return True
+
+    def keep_attached(self, owner: str) -> bool:
+        """Keep the outputs attached to *owner* last time, if all still exist."""
+        attached = self.previous_attached.get(owner)
+        if attached is None:
+            return False
+        for out in attached:
+            if out not in self.previous or not os.path.exists(self.path(out)):
+                return False
+        for out in attached:
+            self._keep(out, self.previous[out])
+        self.attached[owner] = attached
+        return True
+
+    def _keep(self, rel: str, key: str) -> None:
+        self.outputs[rel] = key
+        for suffix in self.suffixes:
+            if self.previous.get(rel + suffix) == key:
+                self.outputs[rel + suffix] = key
+
+    def write(self, rel: str, key: str, data: bytes, *, atomic: bool = False) -> None:
+        """Write *data* to *rel*; ``atomic`` guards against concurrent writers."""
+        path = self.path(rel)
+        with self.result.stage("write"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_file(path, data, atomic)
+        self.outputs[rel] = key
+        if not is_compressible(rel):
+            return
+        with self.result.stage("compress"):
+            siblings = compress(data, self.encodings)
+        with self.result.stage("write"):
+            for suffix, payload in siblings:
+                _write_file(path + suffix, payload, atomic)
+                self.outputs[rel + suffix] = key
+
+    def attach(self, owner: str, rel: str, data: bytes, *, overwrite: bool = False) -> None:
+        """Write the output *rel* on behalf of *owner*.
+
+        Outputs are content-addressed unless *overwrite* is given: several
+        pages, possibly in several worker processes, attach the same output,
+        and it is only written if it does not exist yet.  With *overwrite*,
+        it is still not rewritten if its content is the same as last time.
+        """
+        self.attached.setdefault(owner, []).append(rel)
+        if rel in self.outputs and not overwrite:
+            return
+        key = hashlib.sha256(data).hexdigest()
+        path = self.path(rel)
+        if overwrite and self.previous.get(rel) == key and os.path.exists(path):
+            self._keep(rel, key)
+            return
+        if overwrite or not os.path.exists(path):
+            self.write(rel, key, data, atomic=True)
+            return
+        self.outputs[rel] = key
+        for suffix in self.suffixes:
+            if os.path.exists(path + suffix):
+                self.outputs[rel + suffix] = key
+
+    def attach_file(self, owner: str, rel: str, source: str) -> None:
+        """Like :meth:`attach`, copying the content-addressed file *source*."""
+        self.attached.setdefault(owner, []).append(rel)
+        if rel in self.outputs:
+            return
+        path = self.path(rel)
+        if not os.path.exists(path):
+            with self.result.stage("write"):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copyfile(source, path)
+        self.outputs[rel] = os.path.basename(source)
+
+    def copy(self, rel: str, key: str, source: str) -> None:
+        if is_compressible(rel):
+            with self.result.stage("write"), open(source, "rb") as fh:
+                data = fh.read()
+            self.write(rel, key, data)
+            return
+        path = self.path(rel)
+        with self.result.stage("write"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(source, path)
+        self.outputs[rel] = key
+
+
+def _write_file(path: str, data: bytes, atomic: bool) -> None:
+    target = path
+    if atomic:
+        path = f"{path}.{os.getpid()}.tmp"
+    with open(path, "wb") as fh:
+        fh.write(data)
+    if atomic:
+        os.replace(path, target)
+
+
+def _minified(rel: str, data: bytes) -> bytes:
+    if rel.endswith((".min.css", ".min.js")):
+        return data
+    minify = minify_css if rel.endswith(".css") else minify_js
+    return minify(data.decode("utf-8")).encode("utf-8")
+
+
+#: Outputs, attached outputs, rendered pages, the file holding their index
+#: entries (if any) and stage timings of a batch.
+_Rendered = tuple[dict[str, str], dict[str, list[str]], list[str], str | None, dict[str, float]]
+
+
+def _image_cache(config: Config) -> ImageCache | None:
+    formats = available_formats(list(config.option("image_formats") or []))
+    widths = list(config.option("image_widths") or [])
+    if not formats or not widths:
+        return None
+    directory = os.path.join(config.root, str(config.option("image_cache")))
+    return ImageCache(directory, widths, formats, int(config.option("image_quality")))
+
+
+def _stylesheet_order(
+    stylesheets: list[tuple[SourceFile, str]], baseurl: str
+) -> list[tuple[SourceFile, str, list[str]]]:
+    """Order *stylesheets* so that the sheets each references come before it.
+
+    Every sheet is returned with the sheets it references.  Cycles are
+    broken arbitrarily; the reference closing one is left as written.
+    """
+    by_rel = {source.rel: (source, digest) for source, digest in stylesheets}
+    deps: dict[str, list[str]] = {}
+    for source, _ in stylesheets:
+        with open(source.path, encoding="utf-8") as fh:
+            urls = css_urls(fh.read())
+        targets = {resolve(url.strip(), source.rel, baseurl) for url in urls}
+        deps[source.rel] = sorted(rel for rel in targets if rel in by_rel and rel != source.rel)
+    ordered: list[tuple[SourceFile, str, list[str]]] = []
+    seen: set[str] = set()
+
+    def visit(rel: str) -> None:
+        if rel in seen:
+            return
+        seen.add(rel)
+        for dep in deps[rel]:
+            visit(dep)
+        ordered.append((*by_rel[rel], deps[rel]))
+
+    for rel in by_rel:
+        visit(rel)
+    return ordered
+
+
+def _copy_static(writer: _Writer, rel: str, key: str, source: str, minify: bool) -> None:
+    if minify and rel.endswith((".css", ".js")):
+        with writer.result.stage("render"), open(source, "rb") as fh:
+            data = _minified(rel, fh.read())
+        writer.write(rel, key, data)
+    else:
+        writer.copy(rel, key, source)
+
+
+class _PageRenderer:
+    """Renders and writes a batch of pages.
+
+    Holds everything rendering needs (configuration, parsed layouts, the
+    asset map, image variants, the bundle optimizer), so that it is pickled to each worker
+    process once rather than with every batch.
+    """
+
+    def __init__(
+        self,
+        config: Config,
+        layouts: Layouts,
+        assets: dict[str, str],
+        baseurl: str,
+        encodings: list[str],
+        optimizer: PageOptimizer | None,
+        images: dict[str, ImageInfo],
+    ):
+        self.config = config
+        self.layouts = layouts
+        self.assets = assets
+        self.images = images
+        self.baseurl = baseurl
+        self.encodings = encodings
+        self.optimizer = optimizer
+
+    def __call__(self, batch: list[tuple[SourceFile, str]]) -> _Rendered:
+        result = BuildResult(destination=self.config.destination)
+        writer = _Writer(result.destination, {}, self.encodings, result)
+        entries = None
+        for source, key in batch:
+            with result.stage("render"):
+                meta, html = _render(source, self.config, self.layouts)
+                html = rewrite_images(html, source.rel, self.images, self.baseurl)
+                html = rewrite_html(html, source.rel, self.assets, self.baseurl)
+            bundles: list[tuple[str, bytes]] = []
+            if self.optimizer is not None:
+                with result.stage("bundle"):
+                    html = self.optimizer.optimize(
+                        html, source.rel, lambda rel, data: bundles.append((rel, data))
+                    )
+            for rel, data in bundles:
+                writer.attach(source.rel, rel, data)
+            writer.write(source.rel, key, html.encode("utf-8"))
+            result.rendered.append(source.rel)
+            if _indexed(self.config, source.rel):
+                with result.stage("index"):
+                    if entries is None:
+                        entries = _EntryFile.create(result.destination)
+                    entry = index_entry(self.config, page_url(source.rel), meta, html)
+                    entries.add(source.rel, key, entry)
+        if entries is not None:
+            entries.close()
+        path = entries.path if entries is not None else None
+        return writer.outputs, writer.attached, result.rendered, path, result.stages
+
+
+_worker_renderer: _PageRenderer | None = None
+
+
+def _init_worker(renderer: _PageRenderer) -> None:
+    global _worker_renderer
+    _worker_renderer = renderer
+
+
+def _render_batch(batch: list[tuple[SourceFile, str]]) -> _Rendered:
+    assert _worker_renderer is not None
+    return _worker_renderer(batch)
+
+
+def _indexed(config: Config, rel: str) -> bool:
+    """Whether the page at *rel* goes in the sitemap, feed or search index."""
+    if posixpath.basename(rel) in ("404.html", "404.htm"):
+        return False
+    return any(config.option(name) for name in ("sitemap", "feed", "search"))
+
+
+def _built_entry(config: Config, source: SourceFile, writer: _Writer) -> IndexEntry:
+    """Extract the index entry of the page *source* from its output."""
+    with open(source.path, "rb") as fh:
+        meta, _ = split_front_matter(_decode(source, fh.read()), source.path)
+    with open(writer.path(source.rel), encoding="utf-8", errors="replace") as fh:
+        html = fh.read()
+    return index_entry(config, page_url(source.rel), meta or {}, html)
+
+
+class _EntryFile:
+    """Index entries, one JSON ``[rel, key, entry]`` line per page, in page order.
+
+    Entries are kept on disk between builds, so neither the manifest nor
+    memory grows with them.
+    """
+
+    def __init__(self, path: str, fh: Any):
+        self.path = path
+        self.fh = fh
+
+    @classmethod
+    def create(cls, dest: str) -> "_EntryFile":
+        fd, path = tempfile.mkstemp(dir=dest, prefix=ENTRIES_NAME + ".", suffix=".tmp")
+        return cls(path, os.fdopen(fd, "w", encoding="utf-8"))
+
+    def add(self, rel: str, key: str, entry: IndexEntry | dict[str, Any]) -> None:
+        if isinstance(entry, IndexEntry):
+            entry = asdict(entry)
+        self.fh.write(json.dumps([rel, key, entry], ensure_ascii=False, separators=(",", ":")))
+        self.fh.write("\n")
+
+    def close(self) -> None:
+        self.fh.close()
+
+    @staticmethod
+    def read(path: str) -> Iterator[tuple[str, str, dict[str, Any]]]:
+        try:
+            fh = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with fh:
+            for line in fh:
+                rel, key, entry = json.loads(line)
+                yield rel, key, entry
+
+
+def _merged_entries(
+    config: Config,
+    pages: list[tuple[SourceFile, str]],
+    rendered: list[str],
+    previous: str,
+    out: _EntryFile,
+    writer: _Writer,
+) -> Iterator[IndexEntry]:
+    """Yield the index entry of every page in *pages*, recording it in *out*.
+
+    Entries come from the *rendered* entry files, else from the *previous*
+    entry file if the page is unchanged since, else from the built page.
+    Both files are in page order, so each is read once, in step with
+    *pages*.
+    """
+    fresh = (item for path in rendered for item in _EntryFile.read(path))
+    old = _EntryFile.read(previous)
+    next_fresh, next_old = next(fresh, None), next(old, None)
+    for source, key in pages:
+        rel = source.rel
+        while next_old is not None and next_old[0] < rel:
+            next_old = next(old, None)
+        if next_fresh is not None and next_fresh[0] == rel:
+            entry = next_fresh[2]
+            next_fresh = next(fresh, None)
+        elif next_old is not None and next_old[0] == rel and next_old[1] == key:
+            entry = next_old[2]
+        else:  # no entry was recorded for it
+            entry = asdict(_built_entry(config, source, writer))
+        out.add(rel, key, entry)
+        yield IndexEntry(**entry)
+
+
+def _index(
+    config: Config, pages: list[tuple[SourceFile, str]], rendered: list[str], writer: _Writer
+) -> None:
+    """Write the indexes of *pages* and replace the entry file they were read from."""
+    path = os.path.join(writer.dest, ENTRIES_NAME)
+    out = _EntryFile.create(writer.dest)
+    try:
+        entries = _merged_entries(config, pages, rendered, path, out, writer)
+        write_indexes(
+            config,
+            entries,
+            lambda rel, data: writer.attach(_INDEX_OWNER, rel, data, overwrite=True),
+            len(pages),
+        )
+        for _ in entries:  # left unread when no index is enabled
+            pass
+        out.close()
+        os.replace(out.path, path)
+    except BaseException:
+        out.close()
+        os.remove(out.path)
+        raise
+
+
+def _remove(dest: str, rel: str) -> None:
+    path = os.path.join(dest, *rel.split("/"))
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return
+    parent = os.path.dirname(path)
+    while parent != dest:
+        try:
+            os.rmdir(parent)
+        except OSError:
+            break
+        parent = os.path.dirname(parent)
+
+
+def _key(*parts: str) -> str:
+    return hashlib.sha256(":".join(parts).encode()).hexdigest()
+
+
+def _write_asset_manifest(dest: str, assets: dict[str, str]) -> None:
+    path = os.path.join(dest, ASSET_MANIFEST_NAME)
+    if not assets:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    data = json.dumps(assets, indent=2, sort_keys=True) + "\n"
+    try:
+        with open(path, encoding="utf-8") as fh:
+            if fh.read() == data:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(data)
+
+
+def build(
+    root: str = ".",
+    *,
+    destination: str | None = None,
+    force: bool = False,
+    config: Config | None = None,
+    workers: int | None = None,
+) -> BuildResult:
+    """Build the site rooted at *root*, re-rendering only what changed.
+
+    Outputs are produced in dependency order: fingerprinted assets first,
+    then stylesheets (whose ``url()`` references point at those assets),
+    then pages.  ``force`` ignores the manifest and rebuilds every output.
+
+    Pages are rendered over a process pool of *workers* processes (default:
+    the ``workers`` option, else one per CPU) once there are enough of them
+    to outweigh starting it.  With a pool, the ``render``, ``write`` and
+    ``compress`` stage timings are summed across workers.
+    """
+    started = time.perf_counter()
+    result = BuildResult(destination="")
+    with result.stage("config"):
+        if config is None:
+            overrides = {"destination": destination} if destination else None
+            config = load_config(root, overrides)
+        dest = result.destination = config.destination
+        os.makedirs(dest, exist_ok=True)
+        manifest = Manifest.load(os.path.join(dest, MANIFEST_NAME))
+        layouts = Layouts.load(layout_dirs(config))
+    cache = _SourceCache(manifest.sources)
+    requested_encodings = list(config.option("compress") or [])
+    encodings = available_encodings(requested_encodings)
+    if "br" in requested_encodings and "br" not in encodings:
+        result.notes.append("brotli is not installed; no .br siblings were written")
+    writer = _Writer(
+        dest, {} if force else manifest.outputs, encodings, result, manifest.attached
+    )
+    fingerprint = bool(config.option("fingerprint"))
+    minify = bool(config.option("minify"))
+    baseurl = str(config.get("baseurl") or "").rstrip("/")
+    salt = f"{__version__}:{','.join(encodings)}:{int(minify)}"
+    # Logical asset path -> the fingerprinted path it is emitted under.
+    assets: dict[str, str] = {}
+
+    image_cache = _image_cache(config)
+
+    pages: list[tuple[SourceFile, str, str | None]] = []
+    stylesheets: list[tuple[SourceFile, str]] = []
+    # (source, digest, output of the original) for images to make variants of
+    originals: list[tuple[SourceFile, str, str]] = []
+    # Sources a page's bundles may be built from.  Unlike fingerprinted
+    # names, their contents do not show in the rendered page.
+    bundle_inputs: list[tuple[str, str]] = []
+    with result.stage("scan"):
+        sources = [(source, *cache.lookup(source)) for _, source in sorted(scan(config).items())]
+    with result.stage("plan"):
+        for source, digest, requested in sources:
+            rel = source.rel
+            if source.is_page:
+                pages.append((source, digest, requested))
+                continue
+            if posixpath.splitext(rel)[1].lower() in BUNDLE_EXTENSIONS:
+                bundle_inputs.append((rel, digest))
+            if not (fingerprint and should_fingerprint(rel)):
+                out = rel
+                if not writer.fresh(rel, _key(salt, digest)):
+                    _copy_static(writer, rel, _key(salt, digest), source.path, minify)
+                    result.copied.append(rel)
+            elif rel.endswith(".css"):
+                stylesheets.append((source, digest))
+                continue
+            else:
+                out = assets[rel] = hashed_name(rel, digest)
+                if not writer.fresh(out, _key(salt, digest)):
+                    _copy_static(writer, out, _key(salt, digest), source.path, minify)
+                    result.copied.append(out)
+            if is_raster(rel):
+                originals.append((source, digest, out))
+
+    images: dict[str, ImageInfo] = {}
+    if originals and image_cache is None:
+        if Image is None and config.option("image_formats"):
+            result.notes.append("Pillow is not installed; images were copied without variants")
+    elif originals:
+        # Copies of one image share their cached variants: each is made once.
+        unique = {digest: source.path for source, digest, _ in originals}
+        with result.stage("images"), ThreadPoolExecutor(cpu_count()) as pool:
+            # Pillow releases the GIL while resizing and encoding.
+            sizes = dict(zip(unique, pool.map(image_cache.prepare, unique.values(), unique)))
+        for source, digest, owner in originals:
+            # Variants kept alongside an unchanged original are re-attached
+            # below, so ones the current settings no longer produce go stale.
+            for stale_variant in writer.attached.pop(owner, []):
+                writer.outputs.pop(stale_variant, None)
+            if sizes[digest] is None:
+                result.notes.append(f"{source.rel}: not a readable image; copied without variants")
+                continue
+            info = images[source.rel] = image_cache.info(source.rel, digest, *sizes[digest])
+            for variant in info.variants:
+                writer.attach_file(owner, variant.rel, variant.cached)
+
+    # Stylesheets are hashed after rewriting, so an asset they reference
+    # changing gives them a new name as well.  Those they reference come
+    # first, for the same reason.
+    asset_digest = _key(json.dumps(assets, sort_keys=True))
+    with result.stage("plan"):
+        ordered = _stylesheet_order(stylesheets, baseurl)
+    for source, digest, deps in ordered:
+        key = _key(salt, digest, asset_digest, *(assets.get(dep, "") for dep in deps))
+        previous = manifest.assets.get(source.rel)
+        if previous is not None and writer.fresh(previous, key):
+            assets[source.rel] = previous
+            continue
+        with result.stage("render"), open(source.path, encoding="utf-8") as fh:
+            data = rewrite_css(fh.read(), source.rel, assets, baseurl).encode("utf-8")
+            if minify:
+                data = _minified(source.rel, data)
+        out = assets[source.rel] = hashed_name(source.rel, hashlib.sha256(data).hexdigest())
+        writer.write(out, key, data)
+        result.copied.append(out)
+
+    page_salt = _key(
+        salt,
+        config.digest,
+        json.dumps(assets, sort_keys=True),
+        repr(sorted(images.items())),
+        json.dumps(bundle_inputs) if config.option("bundle") else "",
+    )
+    with result.stage("plan"):
+        stale: list[tuple[SourceFile, str]] = []
+        keys: dict[str, str] = {}
+        for source, digest, requested in pages:
+            layout = _resolve_layout(requested, layouts)
+            try:
+                chain = layouts.chain_digest(layout)
+            except TemplateError as exc:
+                raise BuildError(f"{source.rel}: {exc}") from None
+            key = keys[source.rel] = _key(page_salt, digest, chain)
+            if writer.fresh(source.rel, key):
+                continue
+            stale.append((source, key))
+
+    optimizer = PageOptimizer(dest, baseurl, minify) if config.option("bundle") else None
+    renderer = _PageRenderer(config, layouts, assets, baseurl, encodings, optimizer, images)
+    if workers is None:
+        workers = config.option("workers")
+    jobs = worker_count(workers, len(stale))
+    if jobs > 1:
+        rendered = map_batches(
+            _render_batch, stale, jobs, initializer=_init_worker, initargs=(renderer,)
+        )
+    else:
+        rendered = [renderer(stale)]
+    # Merged in submission order, so the result does not depend on how many
+    # workers there were or which finished first.
+    entry_files: list[str] = []
+    for outputs, attached, rels, entry_file, stages in rendered:
+        writer.outputs.update(outputs)
+        writer.attached.update(attached)
+        result.rendered.extend(rels)
+        if entry_file is not None:
+            entry_files.append(entry_file)
+        for name, seconds in stages.items():
+            result.stages[name] = result.stages.get(name, 0.0) + seconds
+
+    with result.stage("index"):
+        indexed = [
+            (source, keys[source.rel]) for source, _, _ in pages if _indexed(config, source.rel)
+        ]
+        index_key = _key(*(f"{source.rel}:{key}" for source, key in indexed))
+        try:
+            unchanged = index_key == manifest.index_key and os.path.exists(
+                os.path.join(dest, ENTRIES_NAME)
+            )
+            if not (unchanged and writer.keep_attached(_INDEX_OWNER)):
+                _index(config, indexed, entry_files, writer)
+        finally:
+            for path in entry_files:
+                os.remove(path)
+
+    with result.stage("finalize"):
+        for rel in sorted(manifest.outputs.keys() - writer.outputs.keys()):
+            _remove(dest, rel)
+            result.removed.append(rel)
+        _write_asset_manifest(dest, assets)
+        # Rewriting an unchanged manifest would dominate a no-op rebuild.
+        unchanged = (
+            manifest.sources == cache.current
+            and manifest.outputs == writer.outputs
+            and manifest.assets == assets
+            and manifest.attached == writer.attached
+            and manifest.index_key == index_key
+        )
+        if not unchanged:
+            manifest.sources = cache.current
+            manifest.outputs = writer.outputs
+            manifest.assets = assets
+            manifest.attached = writer.attached
+            manifest.index_key = index_key
+            manifest.save()
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,278 @@
+"""Per-page stylesheet and script bundling with critical CSS inlining.
+
+After a page is rendered, the local stylesheets linked from its ``<head>``
+are replaced by one minified bundle.  The rules of that bundle that can
+match elements in the first part of the page body are inlined in a
+``<style>`` element and the bundle itself is preloaded, so first paint does
+not wait for a stylesheet request.  Local blocking scripts are likewise
+bundled into one deferred script, unless the page has inline scripts that
+may depend on them running first.
+
+Bundles are named after their content, so pages sharing a layout share
+the bundle.  ``@import`` rules only take effect at the top of a sheet, so
+those of every stylesheet in a bundle are moved to the top of the bundle
+(where imported rules come before those of all bundled files, not just the
+file that imported them); ``@charset`` rules are dropped, as bundles are
+always UTF-8.  Stylesheets linked with ``media="screen"`` are wrapped in
+``@media screen`` inside the bundle, and their imports restricted to screen.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import Callable
+
+from .fingerprint import HASH_LENGTH, resolve, rewrite_css_urls
+from .minify import Rule, minify_css, minify_js, parse_rules
+
+BUNDLE_DIR = "assets/bundles"
+#: Extensions of the files bundles are made from.
+BUNDLE_EXTENSIONS = frozenset({".css", ".js", ".mjs"})
+#: How much of the body, in characters, counts as above the fold.
+FOLD_CHARS = 10_000
+
+_ATTR = re.compile(r"""([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_LINK = re.compile(r"<link\b([^>]*)>", re.I)
+_SCRIPT = re.compile(r"<script\b([^>]*)>(.*?)</script\s*>", re.I | re.S)
+_TAG = re.compile(r"<([a-zA-Z][\w-]*)([^>]*)>")
+_HEAD_END = re.compile(r"</head\s*>", re.I)
+_BODY_START = re.compile(r"<body\b", re.I)
+_COMPOUND = re.compile(r"[^\s>+~]+")
+_SIMPLE = re.compile(r"([.#]?)(-?[_a-zA-Z][\w-]*|\*)")
+# Comments and rules allowed before a sheet's first style rule.
+_PREAMBLE = re.compile(
+    r"""\s*(?:/\*.*?\*/\s*)*"""
+    r"""(@charset\s+"[^"]*"\s*;|@import\s+(?:url\([^)]*\)|"[^"]*"|'[^']*')[^;]*;)""",
+    re.I | re.S,
+)
+# Anything after the URL of an @import: media queries, layer() or supports().
+_IMPORT_CONDITIONS = re.compile(
+    r"""@import\s+(?:url\([^)]*\)|"[^"]*"|'[^']*')\s*([^;]*);""", re.I | re.S
+)
+#: ``media`` attribute values of stylesheets that may be bundled -> the media
+#: query to wrap them in, if any.
+_BUNDLED_MEDIA = {"": None, "all": None, "screen": "screen"}
+#: Output path, contents and parsed rules of a stylesheet bundle.
+_CSSBundle = tuple[str, bytes, list[Rule]]
+_NON_SCRIPT_TYPES = ("application/ld+json", "application/json", "text/template", "module")
+
+
+def _split_imports(css: str) -> tuple[list[str], str]:
+    """Split *css* into its leading ``@import`` rules and the rest.
+
+    ``@charset`` rules are dropped.
+    """
+    imports, pos = [], 0
+    while match := _PREAMBLE.match(css, pos):
+        if not match.group(1).lower().startswith("@charset"):
+            imports.append(match.group(1))
+        pos = match.end()
+    return imports, css[pos:]
+
+
+def _attrs(text: str) -> dict[str, str]:
+    attrs = {}
+    for match in _ATTR.finditer(text):
+        name, *values = match.groups()
+        attrs[name.lower()] = next((value for value in values if value is not None), "")
+    return attrs
+
+
+class _Seen:
+    """Tag names, ids and classes present above the fold."""
+
+    def __init__(self, html: str):
+        body = _BODY_START.search(html)
+        start = body.start() if body else 0
+        self.tags = {"html", "body", ":root", "*"}
+        self.ids: set[str] = set()
+        self.classes: set[str] = set()
+        for match in _TAG.finditer(html, start, start + FOLD_CHARS):
+            self.tags.add(match.group(1).lower())
+            attrs = _attrs(match.group(2))
+            if "id" in attrs:
+                self.ids.add(attrs["id"])
+            self.classes.update(attrs.get("class", "").split())
+
+    def matches(self, selectors: str) -> bool:
+        return any(self._matches_one(selector) for selector in selectors.split(","))
+
+    def _matches_one(self, selector: str) -> bool:
+        # Pseudo-classes and attribute selectors are ignored, which errs on
+        # the side of inlining a rule.
+        selector = re.sub(r"\[[^\]]*\]|::?[\w-]+(\([^)]*\))?", "", selector)
+        for compound in _COMPOUND.findall(selector):
+            for kind, name in _SIMPLE.findall(compound):
+                if kind == "#" and name not in self.ids:
+                    return False
+                if kind == "." and name not in self.classes:
+                    return False
+                if not kind and name.lower() not in self.tags:
+                    return False
+        return True
+
+
+def critical_css(rules: list[Rule], seen: _Seen) -> str:
+    """Return the rules from *rules* that can apply above the fold."""
+    out = []
+    for rule in rules:
+        if rule.children is not None:
+            inner = critical_css(list(rule.children), seen)
+            if inner:
+                out.append(f"{rule.prelude}{{{inner}}}")
+        elif rule.body is not None and not rule.prelude.startswith("@"):
+            if seen.matches(rule.prelude):
+                out.append(rule.css())
+    return "".join(out)
+
+
+class PageOptimizer:
+    """Rewrites rendered pages to use bundles.
+
+    *write* is called with ``(rel, data)`` for every bundle a page uses and
+    must make it available in the destination; bundles already built by this
+    optimizer are remembered, so each is minified and hashed once per
+    process.
+    """
+
+    def __init__(self, dest: str, baseurl: str, minify: bool = True):
+        self.dest = dest
+        self.baseurl = baseurl
+        self.minify = minify
+        self._css: dict[tuple[tuple[str, str | None], ...], _CSSBundle | None] = {}
+        self._js: dict[tuple[str, ...], tuple[str, bytes]] = {}
+
+    def _read(self, rel: str) -> str:
+        with open(os.path.join(self.dest, *rel.split("/")), encoding="utf-8") as fh:
+            return fh.read()
+
+    def _url(self, rel: str) -> str:
+        return f"{self.baseurl}/{rel}"
+
+    def _local(self, url: str, page_rel: str) -> str | None:
+        rel = resolve(url, page_rel, self.baseurl)
+        if rel is None or not os.path.isfile(os.path.join(self.dest, *rel.split("/"))):
+            return None
+        return rel
+
+    def _css_bundle(
+        self, sheets: tuple[tuple[str, str | None], ...]
+    ) -> _CSSBundle | None:
+        """Bundle the ``(rel, media)`` *sheets*, or return None if they cannot be.
+
+        A sheet restricted to *media* cannot be bundled when it imports
+        another under conditions of its own, which would have to be combined.
+        """
+        if sheets in self._css:
+            return self._css[sheets]
+        cached: _CSSBundle | None = None
+        imports, parts = [], []
+        for rel, media in sheets:
+            # The bundle lives elsewhere, so relative references are
+            # made absolute first.
+            def rebase(url: str, rel: str = rel) -> str:
+                target = resolve(url, rel, self.baseurl)
+                return url if target is None or url.startswith("/") else self._url(target)
+
+            head, body = _split_imports(rewrite_css_urls(self._read(rel), rebase))
+            if media is not None:
+                conditions = [_IMPORT_CONDITIONS.match(rule) for rule in head]
+                if any(match is None or match.group(1).strip() for match in conditions):
+                    break
+                head = [f"{rule[:-1].rstrip()} {media};" for rule in head]
+                body = f"@media {media}{{\n{body}\n}}"
+            imports.extend(head)
+            parts.append(body)
+        else:
+            css = "\n".join(imports + parts)
+            if self.minify:
+                css = minify_css(css)
+            data = css.encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            cached = (f"{BUNDLE_DIR}/bundle.{digest}.css", data, parse_rules(css))
+        self._css[sheets] = cached
+        return cached
+
+    def _js_bundle(self, rels: tuple[str, ...]) -> tuple[str, bytes]:
+        cached = self._js.get(rels)
+        if cached is None:
+            texts = [self._read(rel) for rel in rels]
+            if self.minify:
+                texts = [minify_js(text) for text in texts]
+            data = ";\n".join(texts).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            cached = self._js[rels] = (f"{BUNDLE_DIR}/bundle.{digest}.js", data)
+        return cached
+
+    def optimize(self, html: str, page_rel: str, write: Callable[[str, bytes], None]) -> str:
+        html = self._stylesheets(html, page_rel, write)
+        return self._scripts(html, page_rel, write)
+
+    def _stylesheets(self, html: str, page_rel: str, write: Callable[[str, bytes], None]) -> str:
+        head_end = _HEAD_END.search(html)
+        if head_end is None:
+            return html
+        links = []
+        for match in _LINK.finditer(html, 0, head_end.start()):
+            attrs = _attrs(match.group(1))
+            if attrs.get("rel", "").lower() != "stylesheet":
+                continue
+            media = attrs.get("media", "all").strip().lower()
+            if media not in _BUNDLED_MEDIA:
+                continue
+            rel = self._local(attrs.get("href", ""), page_rel)
+            if rel is not None:
+                links.append((match, (rel, _BUNDLED_MEDIA[media])))
+        if not links:
+            return html
+        bundle = self._css_bundle(tuple(sheet for _, sheet in links))
+        if bundle is None:
+            return html
+        bundle_rel, data, rules = bundle
+        write(bundle_rel, data)
+        url = self._url(bundle_rel)
+        critical = critical_css(rules, _Seen(html))
+        replacement = (
+            (f"<style>{critical}</style>" if critical else "")
+            + f'<link rel="preload" href="{url}" as="style" '
+            "onload=\"this.onload=null;this.rel='stylesheet'\">"
+            f'<noscript><link rel="stylesheet" href="{url}"></noscript>'
+        )
+        return _splice(html, [match for match, _ in links], replacement)
+
+    def _scripts(self, html: str, page_rel: str, write: Callable[[str, bytes], None]) -> str:
+        scripts = []
+        for match in _SCRIPT.finditer(html):
+            attrs = _attrs(match.group(1))
+            if attrs.get("type", "").lower() in _NON_SCRIPT_TYPES:
+                continue
+            if "src" not in attrs:
+                if match.group(2).strip():
+                    return html  # inline code may rely on the scripts before it
+                continue
+            if "async" in attrs or "defer" in attrs or "nomodule" in attrs:
+                continue
+            rel = self._local(attrs["src"], page_rel)
+            if rel is None:
+                return html  # keep ordering relative to scripts we cannot bundle
+            scripts.append((match, rel))
+        if not scripts:
+            return html
+        bundle_rel, data = self._js_bundle(tuple(rel for _, rel in scripts))
+        write(bundle_rel, data)
+        replacement = f'<script defer src="{self._url(bundle_rel)}"></script>'
+        return _splice(html, [match for match, _ in scripts], replacement)
+
+
+def _splice(html: str, matches: list[re.Match[str]], replacement: str) -> str:
+    """Remove every match, putting *replacement* where the first one was."""
+    out, pos = [], 0
+    for index, match in enumerate(matches):
+        out.append(html[pos:match.start()])
+        if index == 0:
+            out.append(replacement)
+        pos = match.end()
+    out.append(html[pos:])
+    return "".join(out)
@@ -0,0 +1,141 @@
+"""Command line entry point: ``python -m sitebuild <command>``."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+
+from .builder import BuildError, build
+from .config import ConfigError, load_config
+
+
+def _cmd_build(args: argparse.Namespace) -> int:
+    result = build(
+        args.source, destination=args.destination, force=args.force, workers=args.jobs
+    )
+    if not args.quiet:
+        for rel in result.rendered:
+            print(f"  render  {rel}")
+        for rel in result.copied:
+            print(f"  copy    {rel}")
+        for rel in result.removed:
+            print(f"  remove  {rel}")
+    for note in result.notes:
+        print(f"note: {note}", file=sys.stderr)
+    print(f"{result.destination}: {result.summary()}")
+    if args.check:
+        config = load_config(args.source)
+        return _report_links(result.destination, str(config.get("baseurl") or ""), args.jobs)
+    return 0
+
+
+def _report_links(dest: str, baseurl: str, jobs: int | None) -> int:
+    from .linkcheck import check_site
+
+    result = check_site(dest, baseurl, jobs)
+    for problem in result.problems:
+        print(problem)
+    print(f"{dest}: {result.summary()}")
+    return 1 if result.problems else 0
+
+
+def _cmd_check(args: argparse.Namespace) -> int:
+    overrides = {"destination": args.destination} if args.destination else None
+    config = load_config(args.source, overrides)
+    return _report_links(config.destination, str(config.get("baseurl") or ""), args.jobs)
+
+
+def _cmd_serve(args: argparse.Namespace) -> int:
+    from .serve import PreviewServer
+
+    overrides = {"destination": args.destination} if args.destination else None
+    config = load_config(args.source, overrides)
+    print(f"{config.destination}: {build(config=config).summary()}")
+    server = PreviewServer(config, live_reload=not args.no_reload, interval=args.interval)
+    try:
+        asyncio.run(server.serve(args.host, args.port, watch=not args.no_watch))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _cmd_bench(args: argparse.Namespace) -> int:
+    from .bench import run, write_report
+
+    report = run(
+        tuple(args.sizes),
+        source=args.source,
+        scenarios=tuple(args.scenarios),
+        repeat=args.repeat,
+        workdir=args.workdir,
+        profile_dir=args.profile,
+        workers=args.jobs,
+        log=lambda message: print(message, file=sys.stderr),
+    )
+    write_report(report, args.output)
+    return 0
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m sitebuild", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = commands.add_parser("build", help="render the site into the destination")
+    build_cmd.add_argument("-s", "--source", default=".", help="site root holding _config.yml")
+    build_cmd.add_argument("-d", "--destination", help="output directory (default: _site)")
+    build_cmd.add_argument("-f", "--force", action="store_true", help="ignore the build cache")
+    build_cmd.add_argument("-j", "--jobs", type=int, help="rendering processes (default: CPUs)")
+    build_cmd.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    build_cmd.add_argument("--check", action="store_true", help="check links after building")
+    build_cmd.set_defaults(func=_cmd_build)
+
+    serve_cmd = commands.add_parser("serve", help="build, then serve and rebuild on changes")
+    serve_cmd.add_argument("-s", "--source", default=".", help="site root holding _config.yml")
+    serve_cmd.add_argument("-d", "--destination", help="output directory (default: _site)")
+    serve_cmd.add_argument("-H", "--host", default="127.0.0.1", help="address to bind")
+    serve_cmd.add_argument("-P", "--port", type=int, default=4000, help="port to bind")
+    serve_cmd.add_argument("--interval", type=float, default=0.25, help="seconds between polls")
+    serve_cmd.add_argument("--no-watch", action="store_true", help="do not rebuild on changes")
+    serve_cmd.add_argument("--no-reload", action="store_true", help="do not inject live reload")
+    serve_cmd.set_defaults(func=_cmd_serve)
+
+    check_cmd = commands.add_parser("check", help="check links in the built site")
+    check_cmd.add_argument("-s", "--source", default=".", help="site root holding _config.yml")
+    check_cmd.add_argument("-d", "--destination", help="output directory (default: _site)")
+    check_cmd.add_argument("-j", "--jobs", type=int, help="parsing processes (default: CPUs)")
+    check_cmd.set_defaults(func=_cmd_check)
+
+    from .bench import DEFAULT_SIZES, SCENARIOS
+
+    bench_cmd = commands.add_parser("bench", help="time builds of synthetic sites")
+    bench_cmd.add_argument("-s", "--source", default=".", help="site whose config to use")
+    bench_cmd.add_argument(
+        "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="page counts"
+    )
+    bench_cmd.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="what to time"
+    )
+    bench_cmd.add_argument("--repeat", type=_positive_int, default=1, help="runs per scenario, best kept")
+    bench_cmd.add_argument("-o", "--output", help="JSON report path (default: stdout)")
+    bench_cmd.add_argument("--workdir", help="generate sites here and keep them")
+    bench_cmd.add_argument("--profile", metavar="DIR", help="dump cProfile stats per run")
+    bench_cmd.add_argument("-j", "--jobs", type=int, help="rendering processes (default: CPUs)")
+    bench_cmd.set_defaults(func=_cmd_bench)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = make_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (BuildError, ConfigError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
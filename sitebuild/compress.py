@@ -0,0 +1,57 @@
+"""Precompressed siblings (``.gz``, ``.br``) for text outputs.
+
+Brotli needs the optional ``brotli`` package; without it only gzip siblings
+are written.  A sibling is only kept when it is smaller than the original, so
+a server can serve whichever encoding exists without checking sizes.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+from typing import Callable
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = frozenset(
+    {".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".xml", ".txt"}
+)
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-for-byte reproducible.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+#: Content-Encoding token -> (file suffix, compressor or None if unavailable).
+ENCODINGS: dict[str, tuple[str, Callable[[bytes], bytes] | None]] = {
+    "br": (".br", _brotli if brotli is not None else None),
+    "gzip": (".gz", _gzip),
+}
+
+
+def available_encodings(requested: list[str]) -> list[str]:
+    """Return the entries of *requested* that can be produced here."""
+    return [name for name in requested if name in ENCODINGS and ENCODINGS[name][1] is not None]
+
+
+def is_compressible(rel: str) -> bool:
+    return os.path.splitext(rel)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+def compress(data: bytes, encodings: list[str]) -> list[tuple[str, bytes]]:
+    """Return ``(suffix, payload)`` for each encoding that actually saves bytes."""
+    siblings = []
+    for name in encodings:
+        suffix, func = ENCODINGS[name]
+        payload = func(data)
+        if len(payload) < len(data):
+            siblings.append((suffix, payload))
+    return siblings
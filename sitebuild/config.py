@@ -0,0 +1,205 @@
+"""Reading ``_config.yml`` and page front matter."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - exercised only without PyYAML
+    yaml = None
+
+CONFIG_NAME = "_config.yml"
+
+#: Jekyll's defaults for the keys the builder looks at.
+DEFAULTS: dict[str, Any] = {
+    "source": ".",
+    "destination": "_site",
+    "title": "",
+    "description": "",
+    "url": "",
+    "baseurl": "",
+    "theme": None,
+    "include": [],
+    "exclude": [
+        "Gemfile",
+        "Gemfile.lock",
+        "node_modules",
+        "vendor",
+    ],
+}
+
+
+#: Builder-specific settings, read from the ``sitebuild`` key of ``_config.yml``.
+#: Jekyll ignores keys it does not know, so they can live in the same file.
+BUILD_DEFAULTS: dict[str, Any] = {
+    "fingerprint": True,
+    "compress": ["gzip", "br"],
+    "minify": True,
+    # Bundle each page's stylesheets and scripts, inlining critical CSS.
+    "bundle": True,
+    # Generated indexes; see sitebuild.indexes.
+    "sitemap": True,
+    "feed": True,
+    "feed_limit": 20,
+    "search": True,
+    # Responsive image variants; see sitebuild.images.
+    "image_widths": [480, 960, 1600],
+    "image_formats": ["avif", "webp"],
+    "image_quality": 80,
+    "image_cache": ".sitebuild-cache",
+    # Page rendering processes; None means one per CPU.
+    "workers": None,
+}
+
+
+class ConfigError(ValueError):
+    """Raised when ``_config.yml`` or a page's front matter cannot be parsed."""
+
+
+@dataclass
+class Config:
+    """Site settings merged over :data:`DEFAULTS`.
+
+    ``digest`` identifies the exact configuration file contents; any change to
+    it invalidates every rendered page.  ``overrides`` are the settings given
+    to :func:`load_config` on top of the file, kept so it can be reloaded.
+    """
+
+    root: str
+    data: dict[str, Any] = field(default_factory=dict)
+    digest: str = ""
+    overrides: dict[str, Any] = field(default_factory=dict)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def option(self, key: str) -> Any:
+        """Return the builder setting *key*, falling back to :data:`BUILD_DEFAULTS`."""
+        options = self.data.get("sitebuild") or {}
+        return options.get(key, BUILD_DEFAULTS[key])
+
+    @property
+    def source(self) -> str:
+        return os.path.normpath(os.path.join(self.root, self.data["source"]))
+
+    @property
+    def destination(self) -> str:
+        return os.path.normpath(os.path.join(self.root, self.data["destination"]))
+
+
+def parse_yaml(text: str, origin: str = "<string>") -> dict[str, Any]:
+    """Parse a YAML mapping, falling back to a flat ``key: value`` reader.
+
+    The fallback only understands top-level scalars and ``- item`` lists, which
+    covers ``_config.yml`` as GitHub Pages sites usually write it.
+    """
+    if yaml is not None:
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as exc:
+            raise ConfigError(f"{origin}: {exc}") from None
+    else:
+        data = _parse_flat_yaml(text, origin)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ConfigError(f"{origin}: expected a mapping at the top level")
+    return data
+
+
+def _parse_flat_yaml(text: str, origin: str) -> dict[str, Any]:
+    data: dict[str, Any] = {}
+    key = None
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.split(" #", 1)[0].rstrip()
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        stripped = line.strip()
+        if stripped.startswith("- ") and key is not None:
+            data.setdefault(key, [])
+            if not isinstance(data[key], list):
+                raise ConfigError(f"{origin}:{lineno}: list item under scalar key")
+            data[key].append(_scalar(stripped[2:]))
+            continue
+        if ":" not in line or line[0].isspace():
+            raise ConfigError(f"{origin}:{lineno}: unsupported YAML without PyYAML")
+        key, _, value = line.partition(":")
+        key = key.strip()
+        data[key] = _scalar(value.strip()) if value.strip() else None
+    return data
+
+
+def _scalar(value: str) -> Any:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    lowered = value.lower()
+    if lowered in ("true", "yes"):
+        return True
+    if lowered in ("false", "no"):
+        return False
+    if lowered in ("null", "~"):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def load_config(root: str = ".", overrides: dict[str, Any] | None = None) -> Config:
+    """Load ``_config.yml`` from *root* merged over the defaults.
+
+    A missing configuration file is not an error: Jekyll builds such sites
+    with its defaults too.
+    """
+    path = os.path.join(root, CONFIG_NAME)
+    try:
+        with open(path, "rb") as fh:
+            raw = fh.read()
+    except FileNotFoundError:
+        raw = b""
+    data = dict(DEFAULTS)
+    data.update(parse_yaml(raw.decode("utf-8"), path))
+    if overrides:
+        data.update(overrides)
+    for key in ("include", "exclude"):
+        if data.get(key) is None:
+            data[key] = []
+        elif isinstance(data[key], str):
+            data[key] = [data[key]]
+    digest = hashlib.sha256(raw)
+    if overrides:
+        digest.update(repr(sorted(overrides.items())).encode())
+    return Config(
+        root=root, data=data, digest=digest.hexdigest(), overrides=dict(overrides or {})
+    )
+
+
+def split_front_matter(text: str, origin: str = "<string>") -> tuple[dict[str, Any] | None, str]:
+    """Split a leading ``---`` front matter block from *text*.
+
+    Returns ``(None, text)`` when the file has no front matter.
+    """
+    if not text.startswith("---"):
+        return None, text
+    first_nl = text.find("\n")
+    if first_nl == -1 or text[3:first_nl].strip():
+        return None, text
+    end = text.find("\n---", first_nl)
+    while end != -1:
+        after = text.find("\n", end + 4)
+        if after == -1:
+            after = len(text)
+        if not text[end + 4:after].strip():
+            break
+        end = text.find("\n---", end + 4)
+    if end == -1:
+        return None, text
+    meta = parse_yaml(text[first_nl + 1:end + 1], origin)
+    return meta, text[after + 1:]
@@ -0,0 +1,136 @@
+"""Content-hashed asset names and rewriting of references to them.
+
+``assets/css/style.css`` is emitted as ``assets/css/style.<hash>.css`` and
+every reference to it is rewritten, so the asset can be served with an
+immutable cache lifetime.  In pages, those are ``href``/``src``/``srcset``/
+``poster`` attributes, ``<meta content>`` (for ``og:image`` and the like)
+and CSS in ``style`` attributes and ``<style>`` elements; in stylesheets,
+``url()`` and ``@import``.  References built at run time by scripts are not
+seen.
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+from typing import Callable
+from urllib.parse import quote, unquote
+
+FINGERPRINT_EXTENSIONS = frozenset(
+    {
+        ".css", ".js", ".mjs",
+        ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp", ".avif",
+        ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    }
+)
+HASH_LENGTH = 10
+
+#: Browsers request these at fixed URLs, so they keep their names.
+FIXED_NAMES = frozenset({"favicon.ico", "apple-touch-icon.png", "robots.txt"})
+
+_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+_HTML_ATTR = re.compile(r"""(\s(?:href|src|poster)\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+_HTML_SRCSET = re.compile(r"""(\ssrcset\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+_HTML_META = re.compile(r"""(<meta\b[^>]*?\scontent\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+_HTML_STYLE_ATTR = re.compile(r"""(\sstyle\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+_HTML_STYLE = re.compile(r"(<style\b)([^>]*>)(.*?)</style\s*>", re.I | re.S)
+_CSS_URL = re.compile(r"""(url\(\s*)(["']?)([^"')]+)\2(\s*\))""", re.I)
+_CSS_IMPORT = re.compile(r"""(@import\s+)(["'])([^"']+)\2""", re.I)
+
+
+def should_fingerprint(rel: str) -> bool:
+    name = posixpath.basename(rel)
+    return name not in FIXED_NAMES and posixpath.splitext(name)[1].lower() in FINGERPRINT_EXTENSIONS
+
+
+def hashed_name(rel: str, digest: str) -> str:
+    """``a/b.css`` -> ``a/b.<digest prefix>.css``."""
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def resolve(url: str, base_rel: str, baseurl: str) -> str | None:
+    """Map *url*, as written in the file at *base_rel*, to a site-relative path.
+
+    Returns ``None`` for external, protocol-relative and fragment-only URLs.
+    """
+    path = re.split(r"[?#]", url, 1)[0]
+    if not path or _SCHEME.match(path) or path.startswith("//"):
+        return None
+    path = unquote(path)
+    if path.startswith("/"):
+        if baseurl and (path + "/").startswith(baseurl + "/"):
+            path = path[len(baseurl):]
+        return posixpath.normpath(path).lstrip("/")
+    return posixpath.normpath(posixpath.join(posixpath.dirname(base_rel), path))
+
+
+def _rewrite_url(url: str, base_rel: str, assets: dict[str, str], baseurl: str) -> str:
+    target = resolve(url.strip(), base_rel, baseurl)
+    hashed = assets.get(target) if target is not None else None
+    if hashed is None:
+        return url
+    url = url.strip()
+    cut = min((i for i in (url.find("?"), url.find("#")) if i != -1), default=len(url))
+    path, rest = url[:cut], url[cut:]
+    return path[: path.rfind("/") + 1] + quote(posixpath.basename(hashed)) + rest
+
+
+def _substitute(pattern: re.Pattern[str], text: str, rewrite: Callable[[str], str]) -> str:
+    def replace(match: re.Match[str]) -> str:
+        whole, offset = match.group(0), match.start()
+        start, end = match.start(3) - offset, match.end(3) - offset
+        return whole[:start] + rewrite(match.group(3)) + whole[end:]
+
+    return pattern.sub(replace, text)
+
+
+def rewrite_css_urls(text: str, rewrite: Callable[[str], str]) -> str:
+    """Replace every ``url()`` and ``@import`` URL in *text* with ``rewrite(url)``."""
+    text = _substitute(_CSS_URL, text, rewrite)
+    return _substitute(_CSS_IMPORT, text, rewrite)
+
+
+def css_urls(text: str) -> list[str]:
+    """Return the ``url()`` and ``@import`` URLs in *text*, in order."""
+    urls: list[str] = []
+
+    def collect(url: str) -> str:
+        urls.append(url)
+        return url
+
+    rewrite_css_urls(text, collect)
+    return urls
+
+
+def rewrite_html(text: str, page_rel: str, assets: dict[str, str], baseurl: str = "") -> str:
+    """Point asset references in the page at *page_rel* to their hashed names."""
+    if not assets:
+        return text
+
+    def one(url: str) -> str:
+        return _rewrite_url(url, page_rel, assets, baseurl)
+
+    def srcset(value: str) -> str:
+        candidates = []
+        for candidate in value.split(","):
+            url, _, descriptor = candidate.strip().partition(" ")
+            candidates.append(f"{one(url)} {descriptor}".strip())
+        return ", ".join(candidates)
+
+    def css(value: str) -> str:
+        return rewrite_css_urls(value, one)
+
+    text = _substitute(_HTML_ATTR, text, one)
+    text = _substitute(_HTML_SRCSET, text, srcset)
+    text = _substitute(_HTML_META, text, one)
+    text = _substitute(_HTML_STYLE_ATTR, text, css)
+    return _substitute(_HTML_STYLE, text, css)
+
+
+def rewrite_css(text: str, css_rel: str, assets: dict[str, str], baseurl: str = "") -> str:
+    """Point ``url()`` and ``@import`` references at their hashed names."""
+    if not assets:
+        return text
+
+    return rewrite_css_urls(text, lambda url: _rewrite_url(url, css_rel, assets, baseurl))
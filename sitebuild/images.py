@@ -0,0 +1,219 @@
+"""Responsive image variants with a persistent derivative cache.
+
+Every JPEG and PNG in the site is resized to the configured widths (never
+upscaled) in each configured format, and ``<img>`` elements pointing at it
+are wrapped in a ``<picture>`` offering those variants through ``srcset``.
+
+Variants are cached outside the destination, in ``<image_cache>/images``,
+under the source's content hash, width and format, so an image is only ever
+decoded again when its contents or the settings change; even a build into
+an empty destination then copies instead of re-encoding.
+
+This needs the optional Pillow package (AVIF additionally needs a Pillow
+built with AVIF support); without it images are copied unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Any, Callable
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+
+from .fingerprint import hashed_name, resolve
+
+RASTER_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png"})
+#: Preferred first: browsers take the first ``<source>`` they support.
+FORMATS = {"avif": ("AVIF", "image/avif"), "webp": ("WEBP", "image/webp")}
+
+_IMG = re.compile(r"<img\b([^>]*?)\s*/?>", re.I)
+_PICTURE = re.compile(r"<picture\b.*?</picture\s*>", re.I | re.S)
+_SRC = re.compile(r"""\ssrc\s*=\s*(["'])(.*?)\1""", re.I | re.S)
+_HAS_ATTR = re.compile(r"""\s(srcset|width|height|sizes)\s*=\s*(["'])(.*?)\2""", re.I | re.S)
+
+
+@dataclass(frozen=True)
+class Variant:
+    format: str
+    width: int
+    rel: str
+    """Output path of the variant in the destination."""
+    cached: str
+    """Path of the variant in the cache."""
+
+
+@dataclass(frozen=True)
+class ImageInfo:
+    width: int
+    height: int
+    variants: tuple[Variant, ...]
+
+
+def available_formats(requested: list[str]) -> list[str]:
+    """The entries of *requested* Pillow can write here, in preference order."""
+    if Image is None:
+        return []
+    Image.init()
+    return [name for name in FORMATS if name in requested and FORMATS[name][0] in Image.SAVE]
+
+
+def is_raster(rel: str) -> bool:
+    return posixpath.splitext(rel)[1].lower() in RASTER_EXTENSIONS
+
+
+class ImageCache:
+    """Derivatives of source images, keyed by content hash, width and format."""
+
+    def __init__(self, directory: str, widths: list[int], formats: list[str], quality: int):
+        self.directory = os.path.join(directory, "images")
+        self.widths = sorted({int(width) for width in widths})
+        self.formats = formats
+        self.quality = quality
+
+    def _variant_digest(self, digest: str) -> str:
+        # Output names change with the quality too, so that a stale variant
+        # is never kept under the same name.
+        return hashlib.sha256(f"{digest}:{self.quality}".encode()).hexdigest()
+
+    def _path(self, digest: str, name: str) -> str:
+        return os.path.join(self.directory, digest[:2], f"{digest}{name}")
+
+    def _targets(self, width: int) -> list[int]:
+        return [w for w in self.widths if w < width] + [width]
+
+    def prepare(self, source: str, digest: str) -> tuple[int, int] | None:
+        """Create the variants of *source* not cached yet; return its size.
+
+        Images with the same *digest* share their cached variants, so they
+        should only be prepared once per build.  Returns ``None`` when
+        Pillow cannot read *source* (it is corrupt, truncated or not the
+        format its extension says).
+        """
+        size_path = self._path(digest, ".json")
+        size: dict[str, Any] | None = None
+        try:
+            with open(size_path, encoding="utf-8") as fh:
+                size = json.load(fh)
+        except (FileNotFoundError, ValueError):
+            pass
+        image = None
+        if size is None:
+            image = self._open(source)
+            if image is None:
+                return None
+            size = {"width": image.width, "height": image.height}
+            data = json.dumps(size).encode("utf-8")
+            _atomic_write(size_path, lambda fh: fh.write(data))
+
+        width, height = size["width"], size["height"]
+        for name in self.formats:
+            for target in self._targets(width):
+                cached = self._cached(digest, target, name)
+                if not os.path.exists(cached):
+                    if image is None:
+                        image = self._open(source)
+                        if image is None:
+                            return None
+                    self._encode(image, target, name, cached)
+        return width, height
+
+    def _cached(self, digest: str, width: int, name: str) -> str:
+        return self._path(digest, f"-{width}-q{self.quality}.{name}")
+
+    def info(self, rel: str, digest: str, width: int, height: int) -> ImageInfo:
+        """Return the variants :meth:`prepare` made of the image at *rel*."""
+        stem, _ = posixpath.splitext(rel)
+        variants = []
+        for name in self.formats:
+            for target in self._targets(width):
+                out = hashed_name(f"{stem}-{target}w.{name}", self._variant_digest(digest))
+                variants.append(Variant(name, target, out, self._cached(digest, target, name)))
+        return ImageInfo(width, height, tuple(variants))
+
+    @staticmethod
+    def _open(source: str) -> Any | None:
+        try:
+            with Image.open(source) as image:
+                image = ImageOps.exif_transpose(image)
+                image.load()
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            return None
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or "A" in image.mode else "RGB")
+        return image
+
+    def _encode(self, image: Any, width: int, name: str, path: str) -> None:
+        if width != image.width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        _atomic_write(path, lambda fh: image.save(fh, format=FORMATS[name][0], quality=self.quality))
+
+
+def _atomic_write(path: str, write: Callable[[IO[bytes]], Any]) -> None:
+    """Create *path* through *write*, never exposing a partial file.
+
+    The temporary file gets a unique name, as builds in other processes or
+    threads may be writing the same path.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def rewrite_images(
+    html: str, page_rel: str, images: dict[str, ImageInfo], baseurl: str = ""
+) -> str:
+    """Wrap ``<img>`` elements showing one of *images* in a ``<picture>``.
+
+    Images that already have a ``srcset`` or sit inside a ``<picture>`` are
+    left as the author wrote them.  Missing ``width``/``height`` attributes
+    are filled in so the browser can reserve space before loading.
+    """
+    if not images:
+        return html
+    pictures = [match.span() for match in _PICTURE.finditer(html)]
+
+    def replace(match: re.Match[str]) -> str:
+        if any(start <= match.start() < end for start, end in pictures):
+            return match.group(0)
+        attrs = match.group(1)
+        src = _SRC.search(attrs)
+        if src is None:
+            return match.group(0)
+        target = resolve(src.group(2).strip(), page_rel, baseurl)
+        info = images.get(target) if target is not None else None
+        if info is None:
+            return match.group(0)
+        present = {found.group(1).lower(): found.group(3) for found in _HAS_ATTR.finditer(attrs)}
+        if "srcset" in present:
+            return match.group(0)
+        sizes = present.get("sizes") or "100vw"
+        sources = []
+        for name in FORMATS:
+            candidates = [v for v in info.variants if v.format == name]
+            if candidates:
+                srcset = ", ".join(f"{baseurl}/{v.rel} {v.width}w" for v in candidates)
+                sources.append(
+                    f'<source type="{FORMATS[name][1]}" srcset="{srcset}" sizes="{sizes}">'
+                )
+        if "width" not in present and "height" not in present:
+            attrs += f' width="{info.width}" height="{info.height}"'
+        return f"<picture>{''.join(sources)}<img{attrs}></picture>"
+
+    return _IMG.sub(replace, html)
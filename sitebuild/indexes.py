@@ -0,0 +1,345 @@
+"""``sitemap.xml``, an Atom feed and a sharded search index in one pass.
+
+What a page contributes to the indexes is extracted once, by
+:func:`index_entry`, from its rendered HTML and front matter while the page
+is built; the builder keeps these entries in a file next to its manifest,
+so a rebuild only extracts them for the pages it re-rendered.  Entries are
+then streamed from that file once each, in a fixed order, and memory does
+not grow with the size of the site:
+
+* sitemap entries are written out in files of at most 50,000 URLs (the
+  protocol limit), with ``sitemap.xml`` becoming a sitemap index when more
+  than one is needed;
+* the feed keeps only the newest ``feed_limit`` dated pages in a heap;
+* search postings are spilled to temporary bucket files and turned into
+  shards one bucket at a time.
+
+The search index lives under ``search/``.  ``meta.json`` describes it;
+``docs-<n>.json`` hold document titles and URLs ``DOCS_PER_CHUNK`` at a
+time; ``shard-<hex>.json`` holds the postings of every term starting with
+the ``PREFIX_LENGTH`` characters whose UTF-8 encoding is ``<hex>``, so a
+browser only fetches the shard for the term it is looking up.  The theme's
+``assets/js/search.js`` is a client for it; it finds the index through the
+``data-search-root`` attribute of the page's ``<html>`` element.
+
+Sitemap and feed URLs are only absolute when ``url`` is set in
+``_config.yml``.
+"""
+
+from __future__ import annotations
+
+import datetime
+import heapq
+import json
+import os
+import re
+import tempfile
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from html import escape
+from html.parser import HTMLParser
+from typing import Any, Callable, Iterable, Iterator
+
+from .config import Config
+
+SITEMAP_LIMIT = 50_000
+DOCS_PER_CHUNK = 1_000
+PREFIX_LENGTH = 2
+SNIPPET_CHARS = 160
+#: Buffered postings, across all buckets, before they are spilled to disk.
+SPILL_LINES = 50_000
+
+SEARCH_DIR = "search"
+SITEMAP_NAME = "sitemap.xml"
+FEED_NAME = "feed.xml"
+
+_WORD = re.compile(r"\w{2,32}")
+_STOPWORDS = frozenset(
+    "an and are as at be but by for from has have in into is it its of on or "
+    "that the their this to was were which will with".split()
+)
+_SKIPPED_TEXT = frozenset({"script", "style", "noscript", "template", "nav", "header", "footer"})
+
+Writer = Callable[[str, bytes], None]
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """What one page contributes to the sitemap, feed and search index.
+
+    ``updated`` is the page's RFC 3339 date, if it has one (only dated pages
+    are in the feed); ``terms`` maps the page's words to their counts and is
+    ``None`` for pages left out of search.
+    """
+
+    url: str
+    updated: str | None
+    sitemap: bool
+    title: str
+    summary: str
+    terms: dict[str, int] | None
+
+
+class _TextParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.description = ""
+        self.text: list[str] = []
+        self._skipping = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in _SKIPPED_TEXT:
+            self._skipping += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            values = dict(attrs)
+            if (values.get("name") or "").lower() == "description":
+                self.description = values.get("content") or ""
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIPPED_TEXT and self._skipping:
+            self._skipping -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self.title += data
+        elif not self._skipping:
+            self.text.append(data)
+
+
+def _parse(html: str) -> _TextParser:
+    parser = _TextParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def _timestamp(value: Any) -> str | None:
+    """Front matter dates as RFC 3339 timestamps, or ``None``."""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value.strip())
+        except ValueError:
+            return None
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.isoformat()
+    if isinstance(value, datetime.date):
+        return f"{value.isoformat()}T00:00:00+00:00"
+    return None
+
+
+def _shard_name(prefix: str) -> str:
+    return f"shard-{prefix.encode('utf-8').hex()}.json"
+
+
+def _json(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _SitemapWriter:
+    def __init__(self, write: Writer, site_url: str):
+        self.write = write
+        self.site_url = site_url
+        self.entries: list[str] = []
+        self.files: list[str] = []
+
+    def add(self, url: str, lastmod: str | None) -> None:
+        entry = f"<url><loc>{escape(self.site_url + url)}</loc>"
+        if lastmod:
+            entry += f"<lastmod>{lastmod}</lastmod>"
+        self.entries.append(entry + "</url>")
+        if len(self.entries) == SITEMAP_LIMIT:
+            self._flush()
+
+    def _flush(self) -> None:
+        name = f"sitemap-{len(self.files) + 1}.xml"
+        self.files.append(name)
+        self.write(name, self._document("urlset", self.entries))
+        self.entries = []
+
+    @staticmethod
+    def _document(root: str, entries: list[str]) -> bytes:
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<{root} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + "\n".join(entries)
+            + f"\n</{root}>\n"
+        ).encode("utf-8")
+
+    def close(self) -> None:
+        if not self.files:
+            self.write(SITEMAP_NAME, self._document("urlset", self.entries))
+            return
+        if self.entries:
+            self._flush()
+        entries = [f"<sitemap><loc>{escape(self.site_url)}/{name}</loc></sitemap>" for name in self.files]
+        self.write(SITEMAP_NAME, self._document("sitemapindex", entries))
+
+
+class _FeedWriter:
+    def __init__(self, write: Writer, config: Config, site_url: str, limit: int):
+        self.write = write
+        self.config = config
+        self.site_url = site_url
+        self.limit = limit
+        # Min-heap of the newest entries: (timestamp, rel, entry).
+        self.newest: list[tuple[str, str, str]] = []
+
+    def add(self, page: IndexEntry) -> None:
+        if page.updated is None or self.limit <= 0:
+            return
+        url = escape(self.site_url + page.url)
+        entry = (
+            f"<entry><title>{escape(page.title)}</title>"
+            f'<link href="{url}" rel="alternate" type="text/html"/>'
+            f"<id>{url}</id><updated>{page.updated}</updated>"
+            f"<summary>{escape(page.summary)}</summary></entry>"
+        )
+        item = (page.updated, page.url, entry)
+        if len(self.newest) < self.limit:
+            heapq.heappush(self.newest, item)
+        else:
+            heapq.heappushpop(self.newest, item)
+
+    def close(self) -> None:
+        entries = sorted(self.newest, reverse=True)
+        updated = entries[0][0] if entries else "1970-01-01T00:00:00+00:00"
+        title = escape(str(self.config.get("title") or ""))
+        home = escape(self.site_url + "/")
+        self.write(
+            FEED_NAME,
+            (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<feed xmlns="http://www.w3.org/2005/Atom">'
+                f"<title>{title}</title>"
+                f'<link href="{escape(self.site_url)}/{FEED_NAME}" rel="self"/>'
+                f'<link href="{home}" rel="alternate" type="text/html"/>'
+                f"<id>{home}</id><updated>{updated}</updated>\n"
+                + "\n".join(entry for _, _, entry in entries)
+                + "\n</feed>\n"
+            ).encode("utf-8"),
+        )
+
+
+class _SearchWriter:
+    def __init__(self, write: Writer, pages: int):
+        self.write = write
+        self.docs: list[list[str]] = []
+        self.count = 0
+        self.buckets = max(8, min(512, pages // 500))
+        self.buffered: dict[int, list[str]] = defaultdict(list)
+        self.lines = 0
+        self.tmp = tempfile.TemporaryDirectory(prefix="sitebuild-search-")
+
+    def add(self, url: str, title: str, snippet: str, terms: dict[str, int]) -> None:
+        doc = self.count
+        self.count += 1
+        self.docs.append([url, title, snippet])
+        if len(self.docs) == DOCS_PER_CHUNK:
+            self._flush_docs()
+        for term, freq in terms.items():
+            bucket = zlib.crc32(term[:PREFIX_LENGTH].encode("utf-8")) % self.buckets
+            self.buffered[bucket].append(f"{term}\t{doc}\t{freq}\n")
+            self.lines += 1
+        if self.lines >= SPILL_LINES:
+            self._spill()
+
+    def _flush_docs(self) -> None:
+        chunk = (self.count - 1) // DOCS_PER_CHUNK
+        self.write(f"{SEARCH_DIR}/docs-{chunk}.json", _json(self.docs))
+        self.docs = []
+
+    def _spill(self) -> None:
+        for bucket, lines in self.buffered.items():
+            with open(os.path.join(self.tmp.name, str(bucket)), "a", encoding="utf-8") as fh:
+                fh.writelines(lines)
+        self.buffered.clear()
+        self.lines = 0
+
+    def _postings(self, bucket: int) -> Iterator[str]:
+        path = os.path.join(self.tmp.name, str(bucket))
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                yield from fh
+
+    def close(self) -> None:
+        try:
+            if self.docs:
+                self._flush_docs()
+            self._spill()
+            for bucket in range(self.buckets):
+                shards: dict[str, dict[str, list[list[int]]]] = defaultdict(lambda: defaultdict(list))
+                for line in self._postings(bucket):
+                    term, doc, freq = line.rstrip("\n").split("\t")
+                    shards[term[:PREFIX_LENGTH]][term].append([int(doc), int(freq)])
+                for prefix in sorted(shards):
+                    terms = shards[prefix]
+                    data = {term: terms[term] for term in sorted(terms)}
+                    self.write(f"{SEARCH_DIR}/{_shard_name(prefix)}", _json(data))
+            meta = {
+                "docs": self.count,
+                "docsPerChunk": DOCS_PER_CHUNK,
+                "prefixLength": PREFIX_LENGTH,
+            }
+            self.write(f"{SEARCH_DIR}/meta.json", _json(meta))
+        finally:
+            self.tmp.cleanup()
+
+
+def index_entry(config: Config, url: str, meta: dict[str, Any], html: str) -> IndexEntry:
+    """Extract the index entry of the page at *url* from its HTML and front matter.
+
+    Front matter setting ``sitemap`` or ``search`` to false leaves the page
+    out of that index.
+    """
+    updated = _timestamp(meta.get("last_modified_at") or meta.get("date"))
+    title = str(meta.get("title") or url)
+    summary = str(meta.get("description") or "")
+    terms = None
+    if config.option("feed") or config.option("search"):
+        parsed = _parse(html)
+        title = str(meta.get("title") or parsed.title.strip() or url)
+        text = " ".join(" ".join(parsed.text).split())
+        summary = str(meta.get("description") or parsed.description or text[:SNIPPET_CHARS])
+        if config.option("search") and meta.get("search", True) is not False:
+            words = _WORD.findall(f"{title} {text}".lower())
+            terms = dict(Counter(word for word in words if word not in _STOPWORDS))
+    return IndexEntry(url, updated, meta.get("sitemap", True) is not False, title, summary, terms)
+
+
+def write_indexes(config: Config, pages: Iterable[IndexEntry], write: Writer, count: int) -> None:
+    """Write whichever of sitemap, feed and search index *config* enables from *pages*.
+
+    *pages* is read once; *count* is how many it holds.
+    """
+    site_url = str(config.get("url") or "").rstrip("/") + str(config.get("baseurl") or "").rstrip("/")
+    sitemap = _SitemapWriter(write, site_url) if config.option("sitemap") else None
+    feed = None
+    if config.option("feed"):
+        feed = _FeedWriter(write, config, site_url, int(config.option("feed_limit")))
+    search = _SearchWriter(write, count) if config.option("search") else None
+    if sitemap is None and feed is None and search is None:
+        return
+
+    for page in pages:
+        if sitemap is not None and page.sitemap:
+            sitemap.add(page.url, page.updated)
+        if feed is not None:
+            feed.add(page)
+        if search is not None and page.terms is not None:
+            search.add(page.url, page.title, page.summary[:SNIPPET_CHARS], page.terms)
+
+    if sitemap is not None:
+        sitemap.close()
+    if feed is not None:
+        feed.close()
+    if search is not None:
+        search.close()
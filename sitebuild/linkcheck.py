@@ -0,0 +1,229 @@
+"""Offline checking of internal links, anchors and asset references.
+
+Every HTML file in the built site is parsed incrementally (fed to
+:class:`html.parser.HTMLParser` in chunks, never held whole in memory
+alongside its parse), in parallel across processes for large sites.
+Stylesheets are scanned for ``url()`` and ``@import`` references, as are
+``<style>`` elements and ``style`` attributes in pages.  The links found
+are then resolved against a single listing of the destination directory;
+resolutions are cached by URL, so a navigation link shared by every page is
+looked up once.  External URLs are not checked.
+"""
+
+from __future__ import annotations
+
+import codecs
+import os
+import posixpath
+import time
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from urllib.parse import unquote
+
+from .builder import ASSET_MANIFEST_NAME, ENTRIES_NAME, MANIFEST_NAME, PAGE_EXTENSIONS
+from .compress import ENCODINGS
+from .fingerprint import css_urls, resolve
+from .parallel import map_batches, worker_count
+
+#: Tag -> attributes holding a single URL.
+LINK_ATTRS: dict[str, tuple[str, ...]] = {
+    "a": ("href",),
+    "area": ("href",),
+    "link": ("href",),
+    "img": ("src",),
+    "script": ("src",),
+    "iframe": ("src",),
+    "embed": ("src",),
+    "audio": ("src",),
+    "video": ("src", "poster"),
+    "source": ("src",),
+    "track": ("src",),
+    "object": ("data",),
+}
+CHUNK_SIZE = 64 * 1024
+STYLESHEET_EXTENSIONS = (".css",)
+
+_SIBLING_SUFFIXES = tuple(suffix for suffix, _ in ENCODINGS.values())
+_IGNORED_FRAGMENTS = ("", "top")
+#: Resolution of URLs that point outside the site; never a real path.
+_EXTERNAL = "\0external"
+
+
+@dataclass(frozen=True)
+class Problem:
+    page: str
+    line: int
+    url: str
+    reason: str
+
+    def __str__(self) -> str:
+        return f"{self.page}:{self.line}: {self.url}: {self.reason}"
+
+
+@dataclass
+class CheckResult:
+    pages: int = 0
+    stylesheets: int = 0
+    links: int = 0
+    problems: list[Problem] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        checked = f"{self.pages} pages"
+        if self.stylesheets:
+            checked += f" and {self.stylesheets} stylesheets"
+        return (
+            f"{self.links} links in {checked}, "
+            f"{len(self.problems)} broken, in {self.elapsed * 1000:.1f} ms"
+        )
+
+
+def _css_links(text: str, line: int, links: list[tuple[int, str]]) -> None:
+    """Add the ``(line, url)`` references in the CSS *text* starting at *line*."""
+    for offset, css_line in enumerate(text.split("\n")):
+        for url in css_urls(css_line):
+            url = url.strip()
+            # Fragment-only URLs point into SVG documents inlined elsewhere.
+            if url and not url.startswith("#"):
+                links.append((line + offset, url))
+
+
+class _LinkParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.ids: set[str] = set()
+        self.links: list[tuple[int, str]] = []
+        self._in_style = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._in_style = tag == "style"
+        wanted = LINK_ATTRS.get(tag, ())
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name == "id" or (name == "name" and tag == "a"):
+                self.ids.add(value)
+            elif name in wanted:
+                self.links.append((self.getpos()[0], value.strip()))
+            elif name == "style":
+                _css_links(value, self.getpos()[0], self.links)
+            elif name == "srcset":
+                line = self.getpos()[0]
+                for candidate in value.split(","):
+                    url = candidate.strip().split(" ", 1)[0]
+                    if url:
+                        self.links.append((line, url))
+
+    def handle_endtag(self, tag: str) -> None:
+        self._in_style = False
+
+    def handle_data(self, data: str) -> None:
+        if self._in_style:
+            _css_links(data, self.getpos()[0], self.links)
+
+
+def parse_page(path: str) -> tuple[set[str], list[tuple[int, str]]]:
+    """Return the anchors defined in and the ``(line, url)`` links found in *path*."""
+    parser = _LinkParser()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with open(path, "rb") as fh:
+        while chunk := fh.read(CHUNK_SIZE):
+            parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.ids, parser.links
+
+
+def parse_stylesheet(path: str) -> tuple[set[str], list[tuple[int, str]]]:
+    """Like :func:`parse_page` for the stylesheet at *path*, which defines no anchors."""
+    links: list[tuple[int, str]] = []
+    with open(path, encoding="utf-8", errors="replace") as fh:
+        _css_links(fh.read(), 1, links)
+    return set(), links
+
+
+def _parse_batch(
+    paths: list[str],
+) -> list[tuple[set[str], list[tuple[int, str]]]]:
+    parsed = []
+    for path in paths:
+        is_stylesheet = path.lower().endswith(STYLESHEET_EXTENSIONS)
+        parsed.append(parse_stylesheet(path) if is_stylesheet else parse_page(path))
+    return parsed
+
+
+def _list_files(dest: str) -> set[str]:
+    files = set()
+    stack = [(dest, "")]
+    while stack:
+        directory, prefix = stack.pop()
+        for entry in os.scandir(directory):
+            rel = prefix + entry.name
+            if entry.is_dir():
+                stack.append((entry.path, rel + "/"))
+            elif not entry.name.endswith(_SIBLING_SUFFIXES) and rel not in (
+                MANIFEST_NAME,
+                ASSET_MANIFEST_NAME,
+                ENTRIES_NAME,
+            ):
+                files.add(rel)
+    return files
+
+
+def _find(target: str, files: set[str]) -> str | None:
+    """Return the file a request for *target* would be served from."""
+    if target in ("", "."):
+        return "index.html" if "index.html" in files else None
+    for candidate in (target, target + "/index.html", target + ".html"):
+        if candidate in files:
+            return candidate
+    return None
+
+
+def check_site(dest: str, baseurl: str = "", workers: int | None = None) -> CheckResult:
+    """Check every page under *dest*; *baseurl* is the site's URL prefix."""
+    started = time.perf_counter()
+    baseurl = baseurl.rstrip("/")
+    files = _list_files(dest)
+    pages = sorted(rel for rel in files if os.path.splitext(rel)[1].lower() in PAGE_EXTENSIONS)
+    stylesheets = sorted(rel for rel in files if rel.lower().endswith(STYLESHEET_EXTENSIONS))
+    checked = pages + stylesheets
+    paths = [os.path.join(dest, *rel.split("/")) for rel in checked]
+
+    batches = map_batches(_parse_batch, paths, worker_count(workers, len(paths)))
+    parsed = [page for batch in batches for page in batch]
+    anchors = {rel: ids for rel, (ids, _) in zip(pages, parsed)}
+
+    result = CheckResult(pages=len(pages), stylesheets=len(stylesheets))
+    # (directory for relative URLs, or None for absolute ones, URL path) -> file
+    resolved: dict[tuple[str | None, str], str | None] = {}
+    for rel, (ids, links) in zip(checked, parsed):
+        directory = posixpath.dirname(rel)
+        for line, url in links:
+            result.links += 1
+            path, _, fragment = url.partition("#")
+            fragment = unquote(fragment)
+            if not path:
+                if fragment not in _IGNORED_FRAGMENTS and fragment not in ids:
+                    result.problems.append(Problem(rel, line, url, "missing anchor"))
+                continue
+            key = (None if path.startswith("/") else directory, path.split("?", 1)[0])
+            if key in resolved:
+                target = resolved[key]
+            else:
+                logical = resolve(path, rel, baseurl)
+                # External, or a scheme such as mailto: that is not ours to check.
+                target = _EXTERNAL if logical is None else _find(logical, files)
+                resolved[key] = target
+            if target == _EXTERNAL:
+                continue
+            if target is None:
+                result.problems.append(Problem(rel, line, url, "missing target"))
+            elif (
+                fragment not in _IGNORED_FRAGMENTS
+                and target in anchors
+                and fragment not in anchors[target]
+            ):
+                result.problems.append(Problem(rel, line, url, "missing anchor"))
+    result.elapsed = time.perf_counter() - started
+    return result
@@ -0,0 +1,137 @@
+"""Conservative CSS and JavaScript minifiers, and a CSS rule splitter.
+
+The CSS minifier drops comments and insignificant whitespace.  The JS
+minifier only removes what cannot change meaning without a real parser:
+blank lines, indentation and whole-line ``//`` comments.  It leaves files
+containing template literals alone, since their whitespace is content.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+_CSS_TOKEN = re.compile(
+    r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""  # strings
+    r"|(/\*!.*?\*/)"  # license comments, kept
+    r"|(/\*.*?\*/)"  # other comments
+    r"|(\s+)",
+    re.S,
+)
+_CSS_TIGHT = re.compile(r"\s*([{};,>])\s*")
+_CSS_AFTER_COLON = re.compile(r":\s+")
+
+
+def minify_css(text: str) -> str:
+    """Return *text* without comments and collapsible whitespace."""
+    # (text, is_literal): strings and kept comments must not be touched.
+    pieces: list[tuple[str, bool]] = []
+    pos = 0
+    for match in _CSS_TOKEN.finditer(text):
+        pieces.append((_tighten(text[pos:match.start()]), False))
+        string, kept, _comment, space = match.groups()
+        if string is not None or kept is not None:
+            pieces.append((string or kept, True))
+        elif space is not None:
+            pieces.append((" ", False))
+        pos = match.end()
+    pieces.append((_tighten(text[pos:]), False))
+    pieces = [(piece, literal) for piece, literal in pieces if piece]
+
+    out: list[tuple[str, bool]] = []
+    for index, (piece, literal) in enumerate(pieces):
+        if not literal and piece == " ":
+            before = out[-1][0][-1:] if out else ""
+            after = pieces[index + 1][0][:1] if index + 1 < len(pieces) else ""
+            if not before or before in "{};,>:" or after in ("", "{", "}", ";", ",", ">", " "):
+                continue
+        if not literal and piece.startswith("}") and out and not out[-1][1]:
+            out[-1] = (out[-1][0].removesuffix(";"), False)
+        out.append((piece, literal))
+    return "".join(piece for piece, _ in out).strip()
+
+
+def _tighten(chunk: str) -> str:
+    if not chunk or chunk.isspace():
+        return chunk
+    chunk = _CSS_TIGHT.sub(r"\1", chunk)
+    return _CSS_AFTER_COLON.sub(":", chunk).replace(";}", "}")
+
+
+def minify_js(text: str) -> str:
+    """Drop blank lines, indentation and whole-line ``//`` comments."""
+    if "`" in text:
+        return text
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith("//"):
+            lines.append(stripped)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+@dataclass(frozen=True)
+class Rule:
+    """One top-level CSS construct.
+
+    Plain rules have a ``body``; grouping at-rules (``@media``,
+    ``@supports``) have ``children``; statements such as ``@import`` have
+    neither.
+    """
+
+    prelude: str
+    body: str | None = None
+    children: tuple["Rule", ...] | None = None
+
+    def css(self) -> str:
+        if self.children is not None:
+            return f"{self.prelude}{{{''.join(rule.css() for rule in self.children)}}}"
+        if self.body is None:
+            return f"{self.prelude};"
+        return f"{self.prelude}{{{self.body}}}"
+
+
+_GROUPING = ("@media", "@supports", "@layer", "@container", "@document")
+
+
+def _skip_string(text: str, pos: int) -> int:
+    quote = text[pos]
+    pos += 1
+    while pos < len(text) and text[pos] != quote:
+        pos += 2 if text[pos] == "\\" else 1
+    return pos + 1
+
+
+def parse_rules(css: str) -> list[Rule]:
+    """Split (minified) *css* into rules, recursing into grouping at-rules."""
+    rules: list[Rule] = []
+    pos, start, length = 0, 0, len(css)
+    while pos < length:
+        char = css[pos]
+        if char in "\"'":
+            pos = _skip_string(css, pos)
+            continue
+        if char == ";":
+            prelude = css[start:pos].strip()
+            if prelude:
+                rules.append(Rule(prelude))
+            pos = start = pos + 1
+            continue
+        if char == "{":
+            prelude = css[start:pos].strip()
+            depth, end = 1, pos + 1
+            while end < length and depth:
+                if css[end] in "\"'":
+                    end = _skip_string(css, end)
+                    continue
+                depth += {"{": 1, "}": -1}.get(css[end], 0)
+                end += 1
+            inner = css[pos + 1:end - 1]
+            if prelude.lower().startswith(_GROUPING):
+                rules.append(Rule(prelude, children=tuple(parse_rules(inner))))
+            else:
+                rules.append(Rule(prelude, body=inner))
+            pos = start = end
+            continue
+        pos += 1
+    return rules
@@ -0,0 +1,72 @@
+"""Process pools shared by page rendering and link checking.
+
+Work is cut into a few batches per worker, so one slow batch does not leave
+the other workers idle, and mapped in submission order, so results never
+depend on how many workers there were or which finished first.  Small jobs
+run in the calling process: below :data:`PARALLEL_THRESHOLD` items,
+starting a pool costs more than it saves.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+#: Below this many items, starting a process pool costs more than it saves.
+PARALLEL_THRESHOLD = 200
+#: Fewest items worth handing to one worker.
+PARALLEL_BATCH = 50
+#: Batches per worker.
+BATCHES_PER_WORKER = 4
+# Forking from the preview server's build thread is unsafe; forkserver
+# is cheap where available and spawn is the portable fallback.
+START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def cpu_count() -> int:
+    """Return the number of CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+def worker_count(workers: int | None, items: int) -> int:
+    """Return how many processes to use for *items* pieces of work.
+
+    *workers* is the requested maximum, all CPUs when None.
+    """
+    if items < PARALLEL_THRESHOLD:
+        return 1
+    return max(1, min(int(workers or cpu_count()), -(-items // PARALLEL_BATCH)))
+
+
+def map_batches(
+    fn: Callable[[list[Item]], Result],
+    items: Sequence[Item],
+    jobs: int,
+    initializer: Callable[..., Any] | None = None,
+    initargs: tuple[Any, ...] = (),
+) -> list[Result]:
+    """Apply *fn* to batches of *items* across *jobs* processes.
+
+    Returns one result per batch, in order.  With a single job, *fn* is
+    called once on all the items in this process and *initializer* is not
+    used.
+    """
+    if jobs <= 1:
+        return [fn(list(items))]
+    size = max(1, -(-len(items) // (jobs * BATCHES_PER_WORKER)))
+    batches = [list(items[i:i + size]) for i in range(0, len(items), size)]
+    context = multiprocessing.get_context(START_METHOD)
+    with ProcessPoolExecutor(
+        jobs, mp_context=context, initializer=initializer, initargs=initargs
+    ) as pool:
+        return list(pool.map(fn, batches))
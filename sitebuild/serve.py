@@ -0,0 +1,325 @@
+"""Local preview server for the built site.
+
+A small asyncio HTTP/1.1 server over the destination directory.  Responses
+carry strong ETags and conditional requests are answered with ``304``;
+precompressed ``.br``/``.gz`` siblings written by the build are served when
+the client accepts them.  A polling watcher rebuilds the site when a source
+file changes and tells open pages to reload over a server-sent event stream.
+
+While live reload is on, pages are served uncompressed with the reload
+script injected; everything else is served as built.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+from email.utils import formatdate
+from typing import Callable
+from urllib.parse import unquote
+
+from .builder import BuildError, BuildResult, build, layout_dirs, scan
+from .compress import ENCODINGS
+from .config import CONFIG_NAME, Config, ConfigError, load_config
+from .fingerprint import HASH_LENGTH
+
+RELOAD_PATH = "/__sitebuild/livereload"
+RELOAD_SCRIPT = (
+    '<script>new EventSource("%s").onmessage = function () { location.reload(); };</script>'
+    % RELOAD_PATH
+)
+#: Minimum ratio of time between polls to time spent polling.
+POLL_BACKOFF = 5
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+_HASHED = re.compile(r"\.[0-9a-f]{%d}\.[^./]+$" % HASH_LENGTH)
+_REASONS = {
+    200: "OK",
+    301: "Moved Permanently",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+}
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if name and params not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class PreviewServer:
+    """Serves *config*'s destination directory, rebuilding on source changes."""
+
+    def __init__(
+        self,
+        config: Config,
+        *,
+        live_reload: bool = True,
+        interval: float = 0.25,
+        log: Callable[[str], None] | None = None,
+    ):
+        self.config = config
+        self.root = config.destination
+        self.baseurl = str(config.get("baseurl") or "").rstrip("/")
+        self.live_reload = live_reload
+        self.interval = interval
+        self.log = log or (lambda message: print(message, file=sys.stderr))
+        # Path -> (mtime_ns, size, digest); hashing is the only per-request
+        # cost worth avoiding.
+        self._digests: dict[str, tuple[int, int, str]] = {}
+        self._listeners: set[asyncio.Queue[str]] = set()
+        self._watcher: asyncio.Task[None] | None = None
+        self._poll_cost = 0.0
+
+    # -- files --------------------------------------------------------------
+
+    def _digest(self, path: str, st: os.stat_result) -> str:
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        with open(path, "rb") as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()[:32]
+        self._digests[path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def _locate(self, url_path: str) -> tuple[str | None, str | None]:
+        """Return ``(file path, redirect target)`` for a request path."""
+        if self.baseurl:
+            if url_path == self.baseurl:
+                return None, self.baseurl + "/"
+            if not url_path.startswith(self.baseurl + "/"):
+                return None, None
+            url_path = url_path[len(self.baseurl):]
+        rel = posixpath.normpath(unquote(url_path)).lstrip("/")
+        if rel.startswith("..") or "\0" in rel:
+            return None, None
+        path = os.path.join(self.root, *[part for part in rel.split("/") if part not in ("", ".")])
+        if os.path.isdir(path):
+            if not url_path.endswith("/"):
+                return None, self.baseurl + url_path + "/"
+            path = os.path.join(path, "index.html")
+        elif not os.path.isfile(path) and os.path.isfile(path + ".html"):
+            path += ".html"
+        return (path if os.path.isfile(path) else None), None
+
+    def respond(
+        self, method: str, target: str, headers: dict[str, str]
+    ) -> tuple[int, list[tuple[str, str]], bytes]:
+        """Build the status, headers and body for one request."""
+        if method not in ("GET", "HEAD"):
+            return 405, [("Allow", "GET, HEAD")], b""
+        path, redirect = self._locate(target.split("?", 1)[0].split("#", 1)[0])
+        if redirect is not None:
+            return 301, [("Location", redirect)], b""
+        status = 200
+        if path is None:
+            status, path = 404, os.path.join(self.root, "404.html")
+            if not os.path.isfile(path):
+                return 404, [("Content-Type", "text/plain; charset=utf-8")], b"Not Found\n"
+
+        ctype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if ctype.startswith("text/") or ctype in ("application/javascript", "image/svg+xml"):
+            ctype += "; charset=utf-8"
+        is_html = ctype.startswith("text/html")
+        inject = self.live_reload and is_html
+
+        accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+        serve_path, encoding = path, None
+        if not inject:
+            for name in ("br", "gzip"):
+                candidate = path + ENCODINGS[name][0]
+                if name in accepted and os.path.isfile(candidate):
+                    serve_path, encoding = candidate, name
+                    break
+
+        st = os.stat(serve_path)
+        etag = self._digest(serve_path, st)
+        if encoding is not None:
+            etag += "-" + encoding
+        elif inject:
+            etag += "-live"
+        etag = f'"{etag}"'
+        cache = IMMUTABLE if _HASHED.search(path) else REVALIDATE
+        out = [("ETag", etag), ("Cache-Control", cache), ("Vary", "Accept-Encoding")]
+
+        if status == 200 and _etag_matches(headers.get("if-none-match", ""), etag):
+            return 304, out, b""
+        with open(serve_path, "rb") as fh:
+            body = fh.read()
+        if inject:
+            body = self._inject(body)
+        out.append(("Content-Type", ctype))
+        if encoding is not None:
+            out.append(("Content-Encoding", encoding))
+        return status, out, body
+
+    @staticmethod
+    def _inject(body: bytes) -> bytes:
+        script = RELOAD_SCRIPT.encode()
+        index = body.lower().rfind(b"</body>")
+        if index == -1:
+            return body + script
+        return body[:index] + script + body[index:]
+
+    # -- HTTP ---------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, "HEAD", 400, [], b"", keep_alive=False)
+                    break
+                headers: dict[str, str] = {}
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = raw.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if target.split("?", 1)[0] == RELOAD_PATH and self.live_reload:
+                    await self._event_stream(writer)
+                    break
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (
+                    version == "HTTP/1.1" or connection == "keep-alive"
+                )
+                status, out, body = self.respond(method, target, headers)
+                await self._send(writer, method, status, out, body, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        status: int,
+        headers: list[tuple[str, str]],
+        body: bytes,
+        *,
+        keep_alive: bool,
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {_REASONS[status]}", f"Date: {formatdate(usegmt=True)}"]
+        lines += [f"{name}: {value}" for name, value in headers]
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if method != "HEAD" and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def _event_stream(self, writer: asyncio.StreamWriter) -> None:
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        self._listeners.add(queue)
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\nretry: 500\n\n"
+            )
+            await writer.drain()
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                else:
+                    writer.write(f"data: {event}\n\n".encode())
+                await writer.drain()
+        finally:
+            self._listeners.discard(queue)
+
+    def notify(self, event: str = "reload") -> None:
+        for queue in self._listeners:
+            queue.put_nowait(event)
+
+    # -- watching -----------------------------------------------------------
+
+    def _signature(self) -> frozenset[tuple[str, int, int]]:
+        """Stat every input of the build; any difference means rebuild."""
+        config = load_config(self.config.root, self.config.overrides)
+        paths = [os.path.join(self.config.root, CONFIG_NAME)]
+        paths += [source.path for source in scan(config).values()]
+        for directory in layout_dirs(config):
+            if os.path.isdir(directory):
+                paths += [entry.path for entry in os.scandir(directory)]
+        signature = set()
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.add((path, st.st_mtime_ns, st.st_size))
+        return frozenset(signature)
+
+    def _rebuild(self) -> BuildResult:
+        self.config = load_config(self.config.root, self.config.overrides)
+        return build(config=self.config)
+
+    async def _timed_signature(self) -> frozenset[tuple[str, int, int]]:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        signature = await loop.run_in_executor(None, self._signature)
+        self._poll_cost = loop.time() - started
+        return signature
+
+    async def watch(self) -> None:
+        """Poll the sources, rebuilding and notifying pages on every change.
+
+        Polls are spaced at least ``POLL_BACKOFF`` times as long as the last
+        one took, so that on large sites the watcher stays a small fraction
+        of a core instead of stat-ing the tree back to back.  Errors are
+        logged and the watcher carries on: a fixed file rebuilds as usual.
+        """
+        last = await self._timed_signature()
+        while True:
+            await asyncio.sleep(max(self.interval, self._poll_cost * POLL_BACKOFF))
+            try:
+                current = await self._timed_signature()
+                if current == last:
+                    continue
+                last = current
+                result = await asyncio.get_running_loop().run_in_executor(None, self._rebuild)
+            except (BuildError, ConfigError) as exc:
+                self.log(f"error: {exc}")
+                continue
+            except Exception as exc:  # keep watching whatever went wrong
+                self.log(f"error: {type(exc).__name__}: {exc}")
+                continue
+            if result.changed:
+                self.log(f"rebuilt: {result.summary()}")
+                self.notify()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 4000, *, watch: bool = True) -> None:
+        server = await asyncio.start_server(self._handle, host, port)
+        async with server:
+            self.log(f"serving {self.root} at http://{host}:{port}{self.baseurl}/")
+            if watch:
+                self._watcher = asyncio.get_running_loop().create_task(self.watch())
+            await server.serve_forever()
@@ -0,0 +1,172 @@
+"""A deliberately small subset of Liquid: ``{{ dotted.name | filter }}``.
+
+Only variable output is supported.  Tags (``{% ... %}``) are left in place
+untouched, which keeps unsupported theme markup visible instead of silently
+dropping it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from .config import split_front_matter
+
+_EXPR = re.compile(r"\{\{-?\s*(.+?)\s*-?\}\}", re.S)
+
+#: Front matter ``layout`` values that mean "emit the page body as is".
+NO_LAYOUT = (None, "", "none", "null", False)
+
+
+class TemplateError(ValueError):
+    """Raised for layouts that cannot be resolved."""
+
+
+def _relative_url(value: Any, context: dict[str, Any]) -> str:
+    baseurl = str(context["site"].get("baseurl") or "").rstrip("/")
+    value = str(value)
+    if not value.startswith("/"):
+        value = "/" + value
+    return baseurl + value
+
+
+def _absolute_url(value: Any, context: dict[str, Any]) -> str:
+    url = str(context["site"].get("url") or "").rstrip("/")
+    return url + _relative_url(value, context)
+
+
+FILTERS: dict[str, Callable[[Any, dict[str, Any]], Any]] = {
+    "escape": lambda value, _ctx: html.escape(str(value)),
+    "relative_url": _relative_url,
+    "absolute_url": _absolute_url,
+    "strip": lambda value, _ctx: str(value).strip(),
+}
+
+
+@dataclass(frozen=True)
+class Template:
+    """Text pre-split into literal chunks and ``(lookup, filters)`` pairs.
+
+    A lookup is either a dotted path as a tuple or a quoted string literal.
+    """
+
+    parts: tuple[Any, ...]
+
+    @classmethod
+    def compile(cls, text: str) -> "Template":
+        parts: list[Any] = []
+        pos = 0
+        for match in _EXPR.finditer(text):
+            if match.start() > pos:
+                parts.append(text[pos:match.start()])
+            expr, *filters = (piece.strip() for piece in match.group(1).split("|"))
+            if len(expr) >= 2 and expr[0] == expr[-1] and expr[0] in "'\"":
+                lookup: Any = expr[1:-1]
+            else:
+                lookup = tuple(expr.split("."))
+            parts.append((lookup, tuple(filters)))
+            pos = match.end()
+        if pos < len(text):
+            parts.append(text[pos:])
+        return cls(tuple(parts))
+
+    def render(self, context: dict[str, Any]) -> str:
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            lookup, filters = part
+            if isinstance(lookup, str):
+                value: Any = lookup
+            else:
+                value = context
+                for name in lookup:
+                    if isinstance(value, dict):
+                        value = value.get(name)
+                    else:
+                        value = None
+                        break
+            for name in filters:
+                func = FILTERS.get(name)
+                if func is None:
+                    raise TemplateError(f"unknown filter {name!r}")
+                value = func("" if value is None else value, context)
+            out.append("" if value is None else str(value))
+        return "".join(out)
+
+
+@dataclass(frozen=True)
+class Layout:
+    name: str
+    template: Template
+    parent: str | None
+    digest: str
+
+
+class Layouts:
+    """Layouts from the site's ``_layouts`` directory over the theme's."""
+
+    def __init__(self, layouts: dict[str, Layout]):
+        self._layouts = layouts
+        self._chain_digests: dict[str, str] = {}
+
+    @classmethod
+    def load(cls, dirs: list[str]) -> "Layouts":
+        """Load layouts from *dirs*; earlier directories take precedence."""
+        layouts: dict[str, Layout] = {}
+        for directory in reversed(dirs):
+            if not os.path.isdir(directory):
+                continue
+            for entry in os.scandir(directory):
+                name, ext = os.path.splitext(entry.name)
+                if ext not in (".html", ".htm") or not entry.is_file():
+                    continue
+                with open(entry.path, "rb") as fh:
+                    raw = fh.read()
+                meta, body = split_front_matter(raw.decode("utf-8"), entry.path)
+                parent = (meta or {}).get("layout")
+                layouts[name] = Layout(
+                    name=name,
+                    template=Template.compile(body),
+                    parent=None if parent in NO_LAYOUT else str(parent),
+                    digest=hashlib.sha256(raw).hexdigest(),
+                )
+        return cls(layouts)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._layouts
+
+    def chain(self, name: str | None) -> list[Layout]:
+        """Return the layout called *name* followed by its ancestors."""
+        chain: list[Layout] = []
+        while name is not None:
+            layout = self._layouts.get(name)
+            if layout is None:
+                raise TemplateError(f"layout {name!r} does not exist")
+            if layout in chain:
+                raise TemplateError(f"layout {name!r} includes itself")
+            chain.append(layout)
+            name = layout.parent
+        return chain
+
+    def chain_digest(self, name: str | None) -> str:
+        """A digest covering every layout *name* renders through."""
+        if name is None:
+            return ""
+        digest = self._chain_digests.get(name)
+        if digest is None:
+            digest = "+".join(layout.digest for layout in self.chain(name))
+            self._chain_digests[name] = digest
+        return digest
+
+    def render(self, name: str | None, content: str, context: dict[str, Any]) -> str:
+        """Render *content* through the layout chain starting at *name*."""
+        for layout in self.chain(name):
+            context = dict(context, content=content)
+            content = layout.template.render(context)
+        return content
@@ -0,0 +1,56 @@
+/* Client for the sharded search index written by sitebuild.indexes.
+ *
+ *   siteSearch("some words").then(function (results) { ... });
+ *
+ * resolves to [{url, title, snippet, score}], best first.  Only the shards
+ * for the query's terms and the document chunks of the hits are fetched.
+ *
+ * The index is looked up under the data-search-root attribute of <html>,
+ * which the layout sets, as this script may be served from a bundle.
+ */
+(function () {
+  var root = document.documentElement.getAttribute("data-search-root") || "/search/";
+  var cache = {};
+
+  function load(name) {
+    if (!cache[name]) {
+      cache[name] = fetch(root + name).then(function (response) {
+        return response.ok ? response.json() : {};
+      });
+    }
+    return cache[name];
+  }
+
+  function hex(text) {
+    return Array.prototype.map.call(new TextEncoder().encode(text), function (byte) {
+      return ("0" + byte.toString(16)).slice(-2);
+    }).join("");
+  }
+
+  window.siteSearch = function (query) {
+    return load("meta.json").then(function (meta) {
+      var terms = (query.toLowerCase().match(/[\p{L}\p{N}_]{2,32}/gu) || []);
+      return Promise.all(terms.map(function (term) {
+        return load("shard-" + hex(term.slice(0, meta.prefixLength)) + ".json").then(function (shard) {
+          return shard[term] || [];
+        });
+      })).then(function (postings) {
+        var scores = {};
+        postings.forEach(function (list) {
+          list.forEach(function (posting) {
+            scores[posting[0]] = (scores[posting[0]] || 0) + posting[1];
+          });
+        });
+        var hits = Object.keys(scores).map(Number).sort(function (a, b) {
+          return scores[b] - scores[a] || a - b;
+        }).slice(0, 50);
+        return Promise.all(hits.map(function (doc) {
+          return load("docs-" + Math.floor(doc / meta.docsPerChunk) + ".json").then(function (docs) {
+            var entry = docs[doc % meta.docsPerChunk];
+            return {url: entry[0], title: entry[1], snippet: entry[2], score: scores[doc]};
+          });
+        }));
+      });
+    });
+  };
+})();
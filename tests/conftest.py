@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+
+class Site:
+    """A throwaway site on disk."""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.dest = os.path.join(self.root, "_site")
+
+    def write(self, rel, content, mode="w"):
+        path = os.path.join(self.root, *rel.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        existed = os.path.exists(path)
+        with open(path, mode) as fh:
+            fh.write(content)
+        if existed:
+            # Make the change visible even on coarse-grained file systems.
+            st = os.stat(path)
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def remove(self, rel):
+        os.remove(os.path.join(self.root, *rel.split("/")))
+
+    def read(self, rel):
+        with open(os.path.join(self.dest, *rel.split("/")), encoding="utf-8") as fh:
+            return fh.read()
+
+    def outputs(self, dest=None):
+        """Relative path -> bytes for everything built, manifests aside."""
+        dest = dest or self.dest
+        files = {}
+        for directory, _, names in os.walk(dest):
+            for name in names:
+                if name.startswith(".sitebuild"):
+                    continue
+                path = os.path.join(directory, name)
+                with open(path, "rb") as fh:
+                    files[os.path.relpath(path, dest).replace(os.sep, "/")] = fh.read()
+        return files
+
+
+@pytest.fixture
+def site(tmp_path):
+    site = Site(tmp_path / "site")
+    site.write("_config.yml", "title: Test\n")
+    site.write("_layouts/default.html", "<html><head></head><body>{{ content }}</body></html>\n")
+    return site
@@ -0,0 +1,18 @@
+from sitebuild.bench import run
+
+
+def _runs(report):
+    return {run["scenario"]: run for run in report["runs"]}
+
+
+def test_rebuild_scenarios_without_cold(site, tmp_path):
+    runs = _runs(run((5,), source=site.root, scenarios=("warm", "edit"), workdir=str(tmp_path)))
+    assert runs["warm"]["rendered"] == 0 and runs["warm"]["copied"] == 0
+    assert runs["edit"]["rendered"] == 1
+
+
+def test_cold_clears_the_configured_destination(site, tmp_path):
+    site.write("_config.yml", "title: Test\ndestination: public\n")
+    report = run((5,), source=site.root, scenarios=("cold", "cold"), workdir=str(tmp_path))
+    assert [run["rendered"] for run in report["runs"]] == [6, 6]
+    assert (tmp_path / "site-5" / "public" / "index.html").exists()
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from sitebuild import build
+from sitebuild.builder import BuildError
+from sitebuild.compress import brotli
+
+
+def test_noop_rebuild_skips_everything(site):
+    site.write("index.html", "<p>home</p>\n")
+    site.write("about.html", "<p>about</p>\n")
+    site.write("notes.txt", "plain\n")
+    first = build(site.root)
+    assert sorted(first.rendered) == ["about.html", "index.html"]
+
+    again = build(site.root)
+    assert not again.changed
+    assert again.rendered == again.copied == again.removed == []
+
+
+def test_editing_a_page_rerenders_only_that_page(site):
+    site.write("index.html", "<p>home</p>\n")
+    site.write("about.html", "<p>about</p>\n")
+    build(site.root)
+
+    site.write("about.html", "<p>about us</p>\n")
+    result = build(site.root)
+    assert result.rendered == ["about.html"]
+    assert "about us" in site.read("about.html")
+
+
+def test_editing_a_layout_rerenders_the_pages_using_it(site):
+    site.write("_layouts/plain.html", "<div>{{ content }}</div>\n")
+    site.write("index.html", "<p>home</p>\n")
+    site.write("plain.html", "---\nlayout: plain\n---\n<p>plain</p>\n")
+    build(site.root)
+
+    site.write("_layouts/plain.html", "<section>{{ content }}</section>\n")
+    result = build(site.root)
+    assert result.rendered == ["plain.html"]
+    assert "<section>" in site.read("plain.html")
+
+
+def test_editing_the_config_rerenders_every_page(site):
+    site.write("index.html", "---\n---\n<h1>{{ site.title }}</h1>\n")
+    site.write("about.html", "<p>about</p>\n")
+    site.write("notes.txt", "plain\n")
+    build(site.root)
+
+    site.write("_config.yml", "title: Renamed\n")
+    result = build(site.root)
+    assert sorted(result.rendered) == ["about.html", "index.html"]
+    assert result.copied == []
+    assert "<h1>Renamed</h1>" in site.read("index.html")
+
+
+def test_deleted_sources_are_removed_from_the_output(site):
+    site.write("index.html", "<p>home</p>\n")
+    site.write("old.html", "<p>old</p>\n")
+    build(site.root)
+
+    os.remove(os.path.join(site.root, "old.html"))
+    result = build(site.root)
+    assert "old.html" in result.removed
+    assert "old.html" not in site.outputs()
+
+
+def test_serial_and_parallel_builds_are_identical(site, tmp_path):
+    for index in range(250):
+        site.write(f"posts/{index}.html", f"---\ntitle: Post {index}\n---\n<p>{index}</p>\n")
+    build(site.root, destination=str(tmp_path / "serial"), workers=1)
+    build(site.root, destination=str(tmp_path / "parallel"), workers=3)
+    serial = site.outputs(str(tmp_path / "serial"))
+    assert serial == site.outputs(str(tmp_path / "parallel"))
+    assert len([rel for rel in serial if rel.startswith("posts/") and rel.endswith(".html")]) == 250
+
+
+def test_undecodable_page_is_a_build_error(site):
+    site.write("index.html", b"\xff\xfe<p>x</p>", mode="wb")
+    with pytest.raises(BuildError, match="index.html"):
+        build(site.root)
+
+
+def test_editing_a_bundled_stylesheet_rebuilds_pages_without_fingerprints(site):
+    site.write("_config.yml", "title: Test\nsitebuild:\n  fingerprint: false\n")
+    site.write(
+        "_layouts/default.html",
+        '<html><head><link rel="stylesheet" href="/style.css"></head>'
+        "<body>{{ content }}</body></html>\n",
+    )
+    site.write("style.css", "p { color: red }\n")
+    site.write("index.html", "<p>home</p>\n")
+    build(site.root)
+    assert "red" in site.read("index.html")
+
+    site.write("style.css", "p { color: blue }\n")
+    result = build(site.root)
+    assert result.rendered == ["index.html"]
+    page = site.read("index.html")
+    assert "blue" in page and "red" not in page
+    bundles = [rel for rel in site.outputs() if rel.startswith("assets/bundles/")]
+    assert len(bundles) == 1 and "blue" in site.read(bundles[0])
+
+
+def test_noop_rebuild_leaves_the_manifest_alone(site):
+    site.write("index.html", "<p>home</p>\n")
+    build(site.root)
+    manifest = os.path.join(site.dest, ".sitebuild-manifest.json")
+    before = os.stat(manifest).st_mtime_ns
+    os.utime(manifest, ns=(before - 10**9, before - 10**9))
+
+    result = build(site.root)
+    assert os.stat(manifest).st_mtime_ns == before - 10**9
+    assert "plan" in result.stages
+
+
+def test_missing_brotli_is_noted(site):
+    if brotli is not None:
+        pytest.skip("brotli is installed")
+    site.write("index.html", "<p>home</p>\n")
+    result = build(site.root)
+    assert "brotli is not installed; no .br siblings were written" in result.notes
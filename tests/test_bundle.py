@@ -0,0 +1,47 @@
+from sitebuild.bundle import PageOptimizer
+
+PAGE = (
+    '<html><head><link rel="stylesheet" href="/a.css"><link rel="stylesheet" href="/b.css">'
+    "</head><body><p>x</p></body></html>"
+)
+
+
+def test_imports_are_hoisted_to_the_top_of_the_bundle(tmp_path):
+    (tmp_path / "a.css").write_text('@charset "UTF-8";\np { color: red }\n')
+    (tmp_path / "b.css").write_text(
+        '/* theme */\n@charset "UTF-8";\n@import url("fonts.css");\n@import "x.css" screen;\n'
+        "h1 { color: blue }\n"
+    )
+    written = {}
+    PageOptimizer(str(tmp_path), "", minify=False).optimize(PAGE, "index.html", written.__setitem__)
+    (bundle,) = written.values()
+    css = bundle.decode()
+    assert css.splitlines()[:2] == ['@import url("/fonts.css");', '@import "/x.css" screen;']
+    assert "@charset" not in css
+    assert css.index("red") < css.index("blue")
+
+
+def _bundle(tmp_path, page):
+    written = {}
+    html = PageOptimizer(str(tmp_path), "", minify=False).optimize(
+        page, "index.html", written.__setitem__
+    )
+    return html, [data.decode() for data in written.values()]
+
+
+def test_screen_stylesheets_stay_screen_only(tmp_path):
+    (tmp_path / "a.css").write_text("p { color: red }\n")
+    (tmp_path / "b.css").write_text('@import "fonts.css";\nh1 { color: blue }\n')
+    page = PAGE.replace('href="/b.css"', 'href="/b.css" media="screen"')
+    _, (css,) = _bundle(tmp_path, page)
+    assert css.splitlines()[0] == '@import "/fonts.css" screen;'
+    assert "@media screen{ h1 { color: blue } }" in " ".join(css.split())
+    assert css.index("red") < css.index("@media screen")
+
+
+def test_screen_stylesheet_with_conditional_import_is_not_bundled(tmp_path):
+    (tmp_path / "a.css").write_text("p { color: red }\n")
+    (tmp_path / "b.css").write_text('@import "wide.css" (min-width: 60em);\nh1 { color: blue }\n')
+    page = PAGE.replace('href="/b.css"', 'href="/b.css" media="screen"')
+    html, bundles = _bundle(tmp_path, page)
+    assert html == page and bundles == []
@@ -0,0 +1,14 @@
+import pytest
+
+from sitebuild.cli import make_parser
+
+
+@pytest.mark.parametrize("value", ["0", "-2", "x"])
+def test_bench_rejects_repeat_below_one(value, capsys):
+    with pytest.raises(SystemExit):
+        make_parser().parse_args(["bench", "--repeat", value])
+    assert "--repeat" in capsys.readouterr().err
+
+
+def test_bench_accepts_positive_repeat():
+    assert make_parser().parse_args(["bench", "--repeat", "3"]).repeat == 3
@@ -0,0 +1,81 @@
+import json
+import os
+
+from sitebuild import build
+from sitebuild.fingerprint import rewrite_css, rewrite_html
+
+ASSETS = {"img/logo.png": "img/logo.0123456789.png", "css/a.css": "css/a.abcdefabcd.css"}
+
+
+def test_rewrite_html_references():
+    html = (
+        '<link rel="stylesheet" href="/css/a.css?v=1">'
+        '<meta property="og:image" content="/img/logo.png">'
+        '<meta name="description" content="A logo">'
+        '<style>h1 { background: url("../img/logo.png") }</style>'
+        "<div style=\"background:url('/img/logo.png')\"></div>"
+        '<img src="logo.png" srcset="/img/logo.png 1x, /img/other.png 2x">'
+        '<a href="https://example.com/img/logo.png">x</a>'
+    )
+    out = rewrite_html(html, "img/page.html", ASSETS)
+    assert 'href="/css/a.abcdefabcd.css?v=1"' in out
+    assert 'content="/img/logo.0123456789.png"' in out
+    assert 'content="A logo"' in out
+    assert 'url("../img/logo.0123456789.png")' in out
+    assert "url('/img/logo.0123456789.png')" in out
+    assert 'src="logo.0123456789.png"' in out
+    assert 'srcset="/img/logo.0123456789.png 1x, /img/other.png 2x"' in out
+    assert 'href="https://example.com/img/logo.png"' in out
+
+
+def test_rewrite_html_strips_baseurl():
+    out = rewrite_html('<img src="/docs/img/logo.png">', "index.html", ASSETS, "/docs")
+    assert out == '<img src="/docs/img/logo.0123456789.png">'
+
+
+def test_rewrite_css_references():
+    css = '@import "a.css";\n@import url(other.css);\n.x { background: url(/img/logo.png#frag) }\n'
+    out = rewrite_css(css, "css/b.css", ASSETS)
+    assert '@import "a.abcdefabcd.css";' in out
+    assert "@import url(other.css);" in out
+    assert "url(/img/logo.0123456789.png#frag)" in out
+
+
+def _hashed(site, rel):
+    with open(os.path.join(site.dest, "asset-manifest.json"), encoding="utf-8") as fh:
+        return json.load(fh)[rel]
+
+
+def test_stylesheets_are_rewritten_in_dependency_order(site):
+    site.write("_config.yml", "title: Test\nsitebuild:\n  minify: false\n")
+    site.write("css/a.css", '@import "b.css";\n')
+    site.write("css/b.css", "p { background: url(../img/dot.png) }\n")
+    site.write("img/dot.png", b"\x89PNG fake", mode="wb")
+    site.write("index.html", '<link rel="stylesheet" href="/css/a.css">\n')
+    build(site.root)
+
+    b = _hashed(site, "css/b.css")
+    assert f'@import "{os.path.basename(b)}";' in site.read(_hashed(site, "css/a.css"))
+    assert os.path.basename(_hashed(site, "img/dot.png")) in site.read(b)
+
+    old_a = _hashed(site, "css/a.css")
+    site.write("css/b.css", "p { color: red }\n")
+    build(site.root)
+    new_b = _hashed(site, "css/b.css")
+    assert new_b != b and _hashed(site, "css/a.css") != old_a
+    assert os.path.basename(new_b) in site.read(_hashed(site, "css/a.css"))
+    assert not os.path.exists(os.path.join(site.dest, b))
+
+
+def test_asset_manifest_lists_hashed_names(site):
+    site.write("_config.yml", "title: Test\nsitebuild:\n  bundle: false\n")
+    site.write("js/app.js", "console.log(1);\n")
+    site.write("favicon.ico", b"\0", mode="wb")
+    site.write("index.html", '<script src="/js/app.js"></script>\n')
+    build(site.root)
+    with open(os.path.join(site.dest, "asset-manifest.json"), encoding="utf-8") as fh:
+        manifest = json.load(fh)
+    assert list(manifest) == ["js/app.js"]
+    assert os.path.exists(os.path.join(site.dest, manifest["js/app.js"]))
+    assert f'src="/{manifest["js/app.js"]}"' in site.read("index.html")
+    assert os.path.exists(os.path.join(site.dest, "favicon.ico"))
@@ -0,0 +1,73 @@
+import io
+import os
+import threading
+
+import pytest
+
+from sitebuild import build
+from sitebuild.images import _atomic_write, available_formats
+
+
+def test_concurrent_writes_to_one_path(tmp_path):
+    path = str(tmp_path / "cache" / "variant.webp")
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def write(n):
+        barrier.wait()
+        try:
+            _atomic_write(path, lambda fh: fh.write(b"%d" % n * 10_000))
+        except Exception as exc:  # pragma: no cover - the failure being tested
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path / "cache") == ["variant.webp"]
+
+
+def test_identical_images_share_their_variants(site):
+    Image = pytest.importorskip("PIL.Image")
+    if not available_formats(["webp", "avif"]):
+        pytest.skip("Pillow cannot write WebP or AVIF here")
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 32), "red").save(buffer, format="PNG")
+    site.write(
+        "_config.yml",
+        "title: Test\nsitebuild:\n  image_widths: [16]\n  image_formats: [webp, avif]\n",
+    )
+    for rel in ("a/photo.png", "b/photo.png", "c/copy.png"):
+        site.write(rel, buffer.getvalue(), mode="wb")
+    site.write("index.html", '<img src="/a/photo.png"><img src="/c/copy.png">\n')
+    build(site.root)
+
+    outputs = site.outputs()
+    for stem in ("a/photo", "b/photo", "c/copy"):
+        assert any(rel.startswith(f"{stem}-16w.") for rel in outputs), stem
+    assert "<picture>" in site.read("index.html")
+    assert not build(site.root).changed
+
+
+def test_unreadable_images_are_copied_with_a_note(site):
+    pytest.importorskip("PIL.Image")
+    if not available_formats(["webp", "avif"]):
+        pytest.skip("Pillow cannot write WebP or AVIF here")
+    site.write(
+        "_config.yml",
+        "title: Test\nsitebuild:\n  fingerprint: false\n  image_widths: [16]\n"
+        "  image_formats: [webp, avif]\n",
+    )
+    site.write("img/broken.png", b"\x89PNG\r\n\x1a\n truncated", mode="wb")
+    site.write("img/html.jpg", b"<html>not an image</html>", mode="wb")
+    site.write("index.html", '<img src="/img/broken.png">\n')
+    result = build(site.root)
+
+    assert "img/broken.png: not a readable image; copied without variants" in result.notes
+    assert "img/html.jpg: not a readable image; copied without variants" in result.notes
+    outputs = site.outputs()
+    assert "img/broken.png" in outputs and "img/html.jpg" in outputs
+    assert not any("-16w." in rel for rel in outputs)
+    assert "<picture>" not in site.read("index.html")
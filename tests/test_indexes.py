@@ -0,0 +1,94 @@
+import json
+import os
+
+from sitebuild import build
+from sitebuild.builder import ENTRIES_NAME
+
+CONFIG = "title: Test\nurl: https://example.com\n"
+
+
+def _post(index, body="words"):
+    return f"---\ntitle: Post {index}\ndate: 2024-01-{index + 1:02d}\n---\n<p>{body} {index}</p>\n"
+
+
+def _indexes(site, dest=None):
+    return {
+        rel: data
+        for rel, data in site.outputs(dest).items()
+        if rel.startswith(("sitemap", "feed", "search/"))
+    }
+
+
+def test_indexes_match_a_clean_build_after_edits(site, tmp_path):
+    site.write("_config.yml", CONFIG)
+    for index in range(5):
+        site.write(f"posts/{index}.html", _post(index))
+    site.write("404.html", "<p>lost</p>\n")
+    build(site.root)
+
+    site.write("posts/2.html", _post(2, "rewritten zebra"))
+    site.write("posts/5.html", _post(5))
+    result = build(site.root)
+    assert sorted(result.rendered) == ["posts/2.html", "posts/5.html"]
+
+    clean = str(tmp_path / "clean")
+    build(site.root, destination=clean)
+    assert _indexes(site) == _indexes(site, clean)
+    shard = json.loads(site.read("search/shard-7a65.json"))
+    assert "zebra" in shard
+    assert "404.html" not in site.read("sitemap.xml")
+
+
+def test_noop_rebuild_keeps_indexes(site):
+    site.write("_config.yml", CONFIG)
+    site.write("index.html", _post(0))
+    build(site.root)
+    before = _indexes(site)
+
+    again = build(site.root)
+    assert not again.changed
+    assert _indexes(site) == before
+
+
+def test_config_change_rewrites_indexes(site):
+    site.write("_config.yml", CONFIG)
+    site.write("index.html", _post(0))
+    build(site.root)
+
+    site.write("_config.yml", "title: Test\nurl: https://example.org\n")
+    build(site.root)
+    assert "https://example.org/" in site.read("sitemap.xml")
+    assert "example.com" not in site.read("feed.xml")
+
+
+def test_search_root_is_set_on_the_page(site):
+    site.write("_config.yml", "title: Test\nbaseurl: /docs\ntheme: slate\n")
+    site.remove("_layouts/default.html")
+    site.write("index.html", "<p>home</p>\n")
+    build(site.root)
+    assert 'data-search-root="/docs/search/"' in site.read("index.html")
+
+
+def test_missing_entries_are_extracted_from_built_pages(site):
+    site.write("_config.yml", CONFIG)
+    site.write("index.html", _post(0, "unicorn"))
+    build(site.root)
+    os.remove(os.path.join(site.dest, ENTRIES_NAME))
+
+    site.write("other.html", _post(1))
+    result = build(site.root)
+    assert result.rendered == ["other.html"]
+    shard = json.loads(site.read("search/shard-756e.json"))
+    assert "unicorn" in shard
+    assert os.path.exists(os.path.join(site.dest, ENTRIES_NAME))
+
+
+def test_entries_are_kept_out_of_the_manifest(site):
+    site.write("_config.yml", CONFIG)
+    site.write("index.html", _post(0))
+    build(site.root)
+    with open(os.path.join(site.dest, ".sitebuild-manifest.json"), encoding="utf-8") as fh:
+        assert "words" not in fh.read()
+    assert [name for name in os.listdir(site.dest) if name.startswith(ENTRIES_NAME)] == [
+        ENTRIES_NAME
+    ]
@@ -0,0 +1,65 @@
+import os
+
+from sitebuild.linkcheck import check_site
+
+
+def _write(root, rel, content):
+    path = os.path.join(root, *rel.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(content)
+
+
+def _problems(dest, baseurl=""):
+    return sorted((p.page, p.line, p.url, p.reason) for p in check_site(dest, baseurl).problems)
+
+
+def test_missing_targets_and_anchors(tmp_path):
+    dest = str(tmp_path)
+    _write(dest, "index.html", (
+        '<a href="about.html#team">ok</a>\n'
+        '<a href="/about.html#nobody">bad anchor</a>\n'
+        '<a href="#top">top</a><a href="#here">self</a><p id="here"></p>\n'
+        '<a href="#gone">gone</a>\n'
+        '<img src="/missing.png">\n'
+        '<a href="https://example.com/x">external</a><a href="mailto:a@b.c">mail</a>\n'
+        '<a href="docs/">dir</a><a href="about">pretty</a>\n'
+    ))
+    _write(dest, "about.html", '<h2 id="team">Team</h2>\n')
+    _write(dest, "docs/index.html", "<p>docs</p>\n")
+    assert _problems(dest) == [
+        ("index.html", 2, "/about.html#nobody", "missing anchor"),
+        ("index.html", 4, "#gone", "missing anchor"),
+        ("index.html", 5, "/missing.png", "missing target"),
+    ]
+
+
+def test_stylesheet_references(tmp_path):
+    dest = str(tmp_path)
+    _write(
+        dest,
+        "css/a.css",
+        '@import "b.css";\n@import url(base.css);\n.x { background: url(../img/dot.png) }\n',
+    )
+    _write(dest, "css/base.css", ".m { mask: url(#clip); background: url(data:image/png,AA) }\n")
+    _write(dest, "index.html", (
+        '<link rel="stylesheet" href="/css/a.css">\n'
+        "<style>\n.y { background: url(/img/none.png) }\n</style>\n"
+        "<div style=\"background: url('/img/also-none.png')\"></div>\n"
+    ))
+    result = check_site(dest)
+    assert result.stylesheets == 2
+    assert sorted((p.page, p.line, p.url) for p in result.problems) == [
+        ("css/a.css", 1, "b.css"),
+        ("css/a.css", 3, "../img/dot.png"),
+        ("index.html", 3, "/img/none.png"),
+        ("index.html", 5, "/img/also-none.png"),
+    ]
+
+
+def test_baseurl_is_stripped(tmp_path):
+    dest = str(tmp_path)
+    _write(dest, "index.html", '<a href="/docs/about.html">in</a><a href="/about.html">out</a>\n')
+    _write(dest, "about.html", "<p>about</p>\n")
+    assert _problems(dest, "/docs/") == []
+    assert _problems(dest) == [("index.html", 1, "/docs/about.html", "missing target")]
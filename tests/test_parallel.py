@@ -0,0 +1,21 @@
+from sitebuild.parallel import PARALLEL_BATCH, PARALLEL_THRESHOLD, map_batches, worker_count
+
+
+def _squares(batch):
+    return [n * n for n in batch]
+
+
+def test_worker_count():
+    assert worker_count(8, PARALLEL_THRESHOLD - 1) == 1
+    assert worker_count(8, PARALLEL_THRESHOLD) == -(-PARALLEL_THRESHOLD // PARALLEL_BATCH)
+    assert worker_count(2, 10_000) == 2
+    assert worker_count(None, 10_000) >= 1
+
+
+def test_map_batches_keeps_order():
+    items = list(range(1_000))
+    expected = [n * n for n in items]
+    assert map_batches(_squares, items, 1) == [expected]
+    batches = map_batches(_squares, items, 3)
+    assert len(batches) > 1
+    assert [n for batch in batches for n in batch] == expected
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+from sitebuild import build
+from sitebuild.config import load_config
+from sitebuild.serve import PreviewServer
+
+
+async def _wait_for(predicate, timeout=5.0):
+    for _ in range(int(timeout / 0.02)):
+        if predicate():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not reached")
+
+
+def test_watcher_survives_unexpected_errors(site):
+    site.write("index.html", "<p>one</p>\n")
+    config = load_config(site.root)
+    build(config=config)
+    messages = []
+    server = PreviewServer(config, interval=0.01, log=messages.append)
+    rebuild = server._rebuild
+    failures = []
+
+    def flaky_rebuild():
+        if not failures:
+            failures.append(True)
+            raise FileNotFoundError("vanished.swp")
+        return rebuild()
+
+    server._rebuild = flaky_rebuild
+
+    async def scenario():
+        watcher = asyncio.create_task(server.watch())
+        await asyncio.sleep(0.1)
+        site.write("index.html", "<p>two</p>\n")
+        await _wait_for(lambda: failures)
+        site.write("index.html", "<p>three</p>\n")
+        await _wait_for(lambda: "three" in site.read("index.html"))
+        watcher.cancel()
+
+    asyncio.run(scenario())
+    assert "error: FileNotFoundError: vanished.swp" in messages
+
+
+def test_undecodable_page_is_logged_and_watching_continues(site):
+    site.write("index.html", "<p>one</p>\n")
+    config = load_config(site.root)
+    build(config=config)
+    messages = []
+    server = PreviewServer(config, interval=0.01, log=messages.append)
+
+    async def scenario():
+        watcher = asyncio.create_task(server.watch())
+        await asyncio.sleep(0.1)
+        site.write("index.html", b"\xff\xfe broken", mode="wb")
+        await _wait_for(lambda: any(message.startswith("error:") for message in messages))
+        site.write("index.html", "<p>fixed</p>\n")
+        await _wait_for(lambda: "fixed" in site.read("index.html"))
+        watcher.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_etag_and_not_modified(site):
+    site.write("index.html", "<p>one</p>\n")
+    config = load_config(site.root)
+    build(config=config)
+    server = PreviewServer(config, live_reload=False)
+    request = {"accept-encoding": "gzip"}
+    status, headers, body = server.respond("GET", "/", request)
+    assert status == 200 and body
+    etag = dict(headers)["ETag"]
+    status, _, body = server.respond("GET", "/", dict(request, **{"if-none-match": etag}))
+    assert status == 304 and body == b""
+
+
+def test_signature_ignores_an_overridden_destination(site):
+    site.write("index.html", "<p>one</p>\n")
+    config = load_config(site.root, {"destination": "out"})
+    build(config=config)
+    server = PreviewServer(config, log=lambda message: None)
+    out = os.path.join(site.root, "out") + os.sep
+    assert not any(path.startswith(out) for path, _, _ in server._signature())
+
+    site.write("index.html", "<p>two</p>\n")
+    assert server._rebuild().rendered == ["index.html"]
+    assert server._signature() == server._signature()